@@ -0,0 +1,17 @@
+"""
+ASGI config for healthcare project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Async views only pay off when served through it, e.g. with uvicorn or daphne.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+application = get_asgi_application()
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    """
+        Runs a function that uses the database in a worker thread of its
+        own, so independent queries of an async view can run concurrently.
+        Connections of the worker threads are cleaned like the ones of a
+        request, following CONN_MAX_AGE.
+    """
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+class AsyncViewMixin(object):
+    """
+        Lets a class based view declare its handlers with async def.
+        Django 3.1 only awaits views that look like coroutine functions.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        return view
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            return response
+
+        # Sync handlers like options() or http_method_not_allowed()
+        async def respond():
+            return response
+        return respond()
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Caches only the current process sees
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+        The replica pins of core.routers live in the default cache, every
+        worker has to see them or users miss their own writes
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if getattr(settings, 'DATABASE_REPLICAS', []) and backend in PER_PROCESS_CACHES:
+        return [Warning(
+            "DATABASE_REPLICAS is set but the default cache is per process, other workers will not see "
+            "the replica pins of a user that just wrote.",
+            hint="Use a shared cache like redis, see core/production_settings.py.",
+            id='core.W001',
+        )]
+    return []
@@ -0,0 +1,100 @@
+import re
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from django.utils import timezone
+
+# "7d", "30d"... the last n days up to now
+DAYS_PRESET = re.compile(r"^(\d{1,4})d$")
+
+# Start of the "all" preset
+ALL_TIME_START = datetime(1970, 1, 1)
+
+END_OF_DAY = time(23, 59, 59)
+
+
+@lru_cache(maxsize=4096)
+def _local_datetime(day, moment, tzinfo):
+    # Localizing is the slow part of resolving a range and graphs keep
+    # asking for the same days
+    return timezone.make_aware(datetime.combine(day, moment), tzinfo)
+
+
+class InvalidDateRange(ValueError):
+    """
+        Raised when a date or preset of a date range cannot be understood
+    """
+
+
+def subtract_month(value):
+    """
+        The same moment one month earlier. The day is clamped to the end of
+        the month, e.g. March 31 becomes February 28 (or 29).
+    """
+    year, month = divmod(value.year * 12 + value.month - 2, 12)
+    month += 1
+    day = min(value.day, monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+class DateRangeResolver(object):
+    """
+        Resolves the from and until dates of a request into aware datetimes
+        of the current timezone.
+
+        Dates are ISO formatted (YYYY-MM-DD), the until date covers the whole
+        day. Without dates the range is the last month, unless a preset like
+        7d, 30d, ytd or all is given.
+    """
+
+    def __init__(self, tzinfo=None):
+        self.tzinfo = tzinfo
+
+    def get_timezone(self):
+        return self.tzinfo or timezone.get_current_timezone()
+
+    def parse_date(self, value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise InvalidDateRange(f"Invalid date {value!r}, use YYYY-MM-DD.")
+
+    def start_of(self, day, tzinfo):
+        return _local_datetime(day, time.min, tzinfo)
+
+    def end_of(self, day, tzinfo):
+        return _local_datetime(day, END_OF_DAY, tzinfo)
+
+    def preset_start(self, preset, now, tzinfo):
+        if preset == "all":
+            return timezone.make_aware(ALL_TIME_START, tzinfo)
+        if preset == "ytd":
+            return self.start_of(date(now.year, 1, 1), tzinfo)
+
+        match = DAYS_PRESET.match(preset)
+        if match:
+            return now - timedelta(days=int(match.group(1)))
+
+        raise InvalidDateRange(f"Invalid range {preset!r}, use 7d, 30d, ytd, all or <number>d.")
+
+    def resolve(self, from_date=None, until_date=None, preset=None, now=None):
+        """
+            Returns the (from_date, until_date) datetimes
+        """
+        tzinfo = self.get_timezone()
+        now = timezone.localtime(now or timezone.now(), tzinfo)
+
+        if from_date:
+            from_date = self.start_of(self.parse_date(from_date), tzinfo)
+        elif preset:
+            from_date = self.preset_start(preset, now, tzinfo)
+        else:
+            from_date = subtract_month(now)
+
+        if until_date:
+            until_date = self.end_of(self.parse_date(until_date), tzinfo)
+        else:
+            until_date = now
+
+        return from_date, until_date
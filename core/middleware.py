@@ -0,0 +1,35 @@
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+from .routers import pin_to_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+        Pins the user to the primary database after any request that may
+        have written, so the next reads see those writes.
+        MiddlewareMixin keeps it usable by the async views too.
+    """
+
+    def process_response(self, request, response):
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
+
+
+class ConnectionHealthCheckMiddleware(MiddlewareMixin):
+    """
+        Closes persistent database connections the server dropped while they
+        sat idle (restarts, failovers, idle timeouts) before the request uses
+        them, Django opens a new one on the next query. Costs a SELECT 1 per
+        reused connection, put it first in MIDDLEWARE.
+    """
+
+    def process_request(self, request):
+        for connection in connections.all():
+            reused = connection.connection is not None and not connection.in_atomic_block
+            if reused and connection.settings_dict['CONN_MAX_AGE'] != 0 and not connection.is_usable():
+                connection.close()
@@ -1,4 +1,24 @@
 from django.db import models
+from django.utils import timezone
+
+
+class ActiveQuerySet(models.QuerySet):
+    """
+        Bulk soft deletes, one UPDATE for the whole query set without
+        calling save() per row
+    """
+
+    def deactivate(self):
+        """
+            Soft deletes the active rows, returns how many changed
+        """
+        return self.filter(is_active=True).update(is_active=False, date_updated=timezone.now())
+
+    def restore(self):
+        """
+            Brings back the deactivated rows, returns how many changed
+        """
+        return self.filter(is_active=False).update(is_active=True, date_updated=timezone.now())
 
 
 class ActiveManager(models.Manager):
@@ -20,10 +40,10 @@ class CommonInfo(models.Model):
 
     # This allows me to escape to default django query set if
     #   later in the project I need it
-    objects = models.Manager()
+    objects = ActiveQuerySet.as_manager()
 
     # for active query set
-    active_objects = ActiveManager()
+    active_objects = ActiveManager.from_queryset(ActiveQuerySet)()
 
     class Meta:
         abstract = True
@@ -0,0 +1,84 @@
+"""
+Production settings, configured through the environment (see .env.example).
+
+    DJANGO_SETTINGS_MODULE=core.production_settings
+
+Postgres with persistent connections that are health checked before every
+request, a shared redis cache and sessions read from it before the database.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE
+
+
+def env_list(name, default=""):
+    return [value.strip() for value in os.environ.get(name, default).split(",") if value.strip()]
+
+
+def env_seconds(name, default):
+    # "none" stands for no limit
+    value = os.environ.get(name, str(default)).strip()
+    return None if value.lower() == "none" else int(value)
+
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = os.environ.get('DJANGO_DEBUG', "") == "1"
+
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS')
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DATABASE_NAME', 'healthcare'),
+        'USER': os.environ.get('DATABASE_USER', ''),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', ''),
+        'PORT': os.environ.get('DATABASE_PORT', ''),
+        # Seconds a connection is reused across requests, 0 closes it after
+        # every request and "none" never does
+        'CONN_MAX_AGE': env_seconds('DATABASE_CONN_MAX_AGE', 600),
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DATABASE_CONNECT_TIMEOUT', 5)),
+        },
+    }
+}
+
+# Read only replicas with the credentials of default, see core/routers.py
+DATABASE_REPLICAS = []
+for number, host in enumerate(env_list('DATABASE_REPLICA_HOSTS'), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+# Persistent connections can be dropped by the server while idle
+MIDDLEWARE = ['core.middleware.ConnectionHealthCheckMiddleware'] + MIDDLEWARE
+
+# Every worker must see the same cache: the latest records, the record
+# versions, the dashboards, the replica pins and the sessions live in it
+CACHE_URL = os.environ.get('DJANGO_CACHE_URL', '')
+if not CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    raise ImproperlyConfigured(
+        "Set DJANGO_CACHE_URL to a redis url, e.g. redis://localhost:6379/0. A per process cache "
+        "would serve stale readings and dashboards from the workers that did not see a write."
+    )
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': CACHE_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 5,
+            'SOCKET_TIMEOUT': 5,
+        },
+    }
+}
+
+# Sessions are read from the shared cache and written through to the database,
+# a cache miss (eviction, a flushed cache) only costs a query
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
@@ -0,0 +1,80 @@
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Users that wrote recently, read from the primary so they see their own writes
+PINNED_KEY = "core:replica:pinned:{user_id}"
+
+_replica = Local()
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_to_primary(user_id):
+    """
+        Sends the reads of a user to the primary for a short while, called
+        after the user writes something
+    """
+    if replica_aliases():
+        cache.set(PINNED_KEY.format(user_id=user_id), True, getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5))
+
+
+def get_replica_alias(user=None):
+    """
+        A replica to read from, None when there is none or the user wrote
+        recently
+    """
+    aliases = replica_aliases()
+    if not aliases:
+        return None
+    if user is not None and user.is_authenticated and cache.get(PINNED_KEY.format(user_id=user.pk)):
+        return None
+    return random.choice(aliases)
+
+
+@contextmanager
+def read_from_replica(user=None):
+    """
+        Routes the reads inside the block to a replica. Only wrap read only
+        code, the replica may lag behind the writes of the block.
+    """
+    previous = getattr(_replica, 'alias', None)
+    _replica.alias = get_replica_alias(user)
+    try:
+        yield _replica.alias
+    finally:
+        _replica.alias = previous
+
+
+class ReplicaRouter(object):
+    """
+        Reads go to a replica inside read_from_replica(), everything else
+        goes to the default database
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_replica, 'alias', None)
+
+    def db_for_write(self, model, **hints):
+        # Objects read from a replica are still saved on the primary
+        if replica_aliases():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in replica_aliases():
+            return False
+        return None
@@ -56,12 +56,23 @@ DATABASES = {
     }
 }
 
+# Read only copies of default, e.g. 'replica': {..., 'TEST': {'MIRROR': 'default'}} in DATABASES.
+# Graph and export reads go to them, see core/routers.py. The latest record
+# cache is always filled from default, see healthcare/cache.py
+DATABASE_REPLICAS = []
+
+# Seconds the reads of a user stay on default after the user writes
+DATABASE_REPLICA_PIN_SECONDS = 5
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,7 +98,38 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+LOGIN_URL = 'users:login'
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# How long the latest blood pressure and body physique of a user stay cached
+HEALTHCARE_LATEST_RECORD_TIMEOUT = 60 * 60 * 24
 
+# How long a rendered dashboard stays cached, it is dropped sooner when the user's records change
+HEALTHCARE_DASHBOARD_TIMEOUT = 60 * 60
+
+
+REST_FRAMEWORK = {
+    # Session first so anonymous browser requests keep getting 403s, a request
+    # without a session cookie never reads the session table
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'users.authentication.JSONWebTokenAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+}
+
+# Token requests never read the user table (users.authentication): request.user
+# only holds the claims, is not staff and has no permissions, and a deactivated
+# user keeps API access until the token expires. Refreshing reads the user, so
+# deactivated users are cut off at the next refresh, a week at most.
 JWT_AUTH = {
     'JWT_EXPIRATION_DELTA': datetime.timedelta(weeks=1),
     # Allow refresh as long the token is valid
@@ -98,6 +140,22 @@ JWT_AUTH = {
 
 }
 
+# Email logins first, usernames (admin, basic auth) fall through to the model backend
+AUTHENTICATION_BACKENDS = [
+    'users.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Stored hashes of another cost are upgraded on the next login
+PASSWORD_HASHER_ITERATIONS = 216000
+
+PASSWORD_HASHERS = [
+    'users.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -1,3 +1,6 @@
+from django.core.exceptions import PermissionDenied, ValidationError
+
+
 def _get_queryset(klass):
     """
         # NOTE: Taken from django code base itself. We could do a lot of things
@@ -10,6 +13,17 @@ def _get_queryset(klass):
     return klass
 
 
+def _get_checked_queryset(klass, function_name):
+    queryset = _get_queryset(klass)
+    if not hasattr(queryset, 'get'):
+        klass__name = klass.__name__ if isinstance(klass, type) else klass.__class__.__name__
+        raise ValueError(
+            "First argument to %s() must be a Model, Manager, "
+            "or QuerySet, not '%s'." % (function_name, klass__name)
+        )
+    return queryset
+
+
 def get_object_or_None(klass, *args, **kwargs):
     """
         # Modified get_object_or_404
@@ -20,15 +34,77 @@ def get_object_or_None(klass, *args, **kwargs):
         Like with QuerySet.get(), MultipleObjectsReturned is raised if more than
         one object is found.
     """
-    queryset = _get_queryset(klass)
-    if not hasattr(queryset, 'get'):
-        klass__name = klass.__name__ if isinstance(klass, type) else klass.__class__.__name__
-        raise ValueError(
-            "First argument to get_object_or_None() must be a Model, Manager, "
-            "or QuerySet, not '%s'." % klass__name
-        )
+    queryset = _get_checked_queryset(klass, 'get_object_or_None')
 
     try:
         return queryset.get(*args, **kwargs)
     except queryset.model.DoesNotExist:
         return None
+
+
+def get_object_or_403(klass, *args, **kwargs):
+    """
+        Like get_object_or_None but raises PermissionDenied if the object
+        does not exist
+    """
+    obj = get_object_or_None(klass, *args, **kwargs)
+    if obj is None:
+        raise PermissionDenied
+    return obj
+
+
+def _pk_set(queryset, pks):
+    # Ids that are not even valid primary keys cannot be owned either
+    try:
+        return {queryset.model._meta.pk.to_python(pk) for pk in pks}
+    except ValidationError:
+        raise PermissionDenied
+
+
+def exists_or_403(klass, *args, **kwargs):
+    """
+        Raises PermissionDenied unless an object matches the filters.
+        For ownership checks that do not need the object itself, the
+        database only answers whether a row exists.
+    """
+    queryset = _get_checked_queryset(klass, 'exists_or_403')
+    if not queryset.filter(*args, **kwargs).exists():
+        raise PermissionDenied
+
+
+def get_pk_or_403(klass, *args, **kwargs):
+    """
+        Like get_object_or_403 but only the primary key is read
+    """
+    queryset = _get_checked_queryset(klass, 'get_pk_or_403')
+    try:
+        return queryset.values_list('pk', flat=True).get(*args, **kwargs)
+    except queryset.model.DoesNotExist:
+        raise PermissionDenied
+
+
+def check_pks_or_403(klass, pks, *args, **kwargs):
+    """
+        Checks many primary keys in one query, for batch endpoints.
+        Raises PermissionDenied if any of them does not match the filters,
+        returns the set of checked primary keys otherwise.
+    """
+    queryset = _get_checked_queryset(klass, 'check_pks_or_403')
+    pks = _pk_set(queryset, pks)
+    found = set(queryset.filter(*args, pk__in=pks, **kwargs).values_list('pk', flat=True))
+    if found != pks:
+        raise PermissionDenied
+    return found
+
+
+def get_objects_or_403(klass, pks, *args, **kwargs):
+    """
+        Fetches many objects by primary key in one query. Raises
+        PermissionDenied if any of them does not match the filters.
+    """
+    queryset = _get_checked_queryset(klass, 'get_objects_or_403')
+    pks = _pk_set(queryset, pks)
+    objects = list(queryset.filter(*args, pk__in=pks, **kwargs))
+    if len(objects) != len(pks):
+        raise PermissionDenied
+    return objects
@@ -0,0 +1,196 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import connection, connections
+from django.shortcuts import reverse
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .checks import check_replica_pin_cache
+from .middleware import ConnectionHealthCheckMiddleware
+from .routers import PINNED_KEY, ReplicaRouter, get_replica_alias, pin_to_primary, read_from_replica
+from .shortcuts import (check_pks_or_403, exists_or_403, get_object_or_403, get_object_or_None,
+                        get_objects_or_403, get_pk_or_403)
+
+
+class ShortcutsTestCases(TestCase):
+    """
+        Makes sure the shortcuts deny anything that does not match
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.active = User.objects.create_user('active', 'active@example.com', 'password')
+        self.inactive = User.objects.create_user('inactive', 'inactive@example.com', 'password', is_active=False)
+        self.users = User.objects.filter(is_active=True)
+
+    def test_single_object(self):
+        self.assertEqual(get_object_or_None(self.users, pk=self.active.pk), self.active)
+        self.assertIsNone(get_object_or_None(self.users, pk=self.inactive.pk))
+        self.assertEqual(get_object_or_403(self.users, pk=self.active.pk), self.active)
+        with self.assertRaises(PermissionDenied):
+            get_object_or_403(self.users, pk=self.inactive.pk)
+
+    def test_existence_checks_read_no_object(self):
+        with self.assertNumQueries(2):
+            exists_or_403(self.users, pk=self.active.pk)
+            self.assertEqual(get_pk_or_403(self.users, username='active'), self.active.pk)
+
+        with self.assertRaises(PermissionDenied):
+            exists_or_403(self.users, pk=self.inactive.pk)
+        with self.assertRaises(PermissionDenied):
+            get_pk_or_403(self.users, pk=self.inactive.pk)
+
+    def test_bulk_checks(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(check_pks_or_403(self.users, [str(self.active.pk), self.active.pk]), {self.active.pk})
+        self.assertEqual(get_objects_or_403(self.users, [self.active.pk]), [self.active])
+
+        for pks in ([self.active.pk, self.inactive.pk], ["not a pk"]):
+            with self.assertRaises(PermissionDenied):
+                check_pks_or_403(self.users, pks)
+            with self.assertRaises(PermissionDenied):
+                get_objects_or_403(self.users, pks)
+
+    def test_rejects_other_arguments(self):
+        with self.assertRaises(ValueError):
+            exists_or_403("users", pk=1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTestCases(TestCase):
+    """
+        Makes sure only the wrapped reads go to the replica and writers
+        keep reading their own writes
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        self.router = ReplicaRouter()
+
+    def test_reads_inside_the_block_use_the_replica(self):
+        User = get_user_model()
+        self.assertEqual(User.objects.all().db, 'default')
+        with read_from_replica(self.user) as alias:
+            self.assertEqual(alias, 'replica')
+            self.assertEqual(User.objects.all().db, 'replica')
+            self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertEqual(User.objects.all().db, 'default')
+
+    def test_writers_are_pinned_to_the_primary(self):
+        pin_to_primary(self.user.pk)
+        with read_from_replica(self.user) as alias:
+            self.assertIsNone(alias)
+            self.assertEqual(get_user_model().objects.all().db, 'default')
+        self.assertEqual(get_replica_alias(), 'replica')
+
+    def test_unsafe_requests_pin_the_user(self):
+        self.client.force_login(self.user)
+        self.client.get('/')
+        self.assertEqual(get_replica_alias(self.user), 'replica')
+        self.client.post('/')
+        self.assertIsNone(get_replica_alias(self.user))
+
+    def test_per_process_cache_is_flagged(self):
+        self.assertEqual([warning.id for warning in check_replica_pin_cache(None)], ['core.W001'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django_redis.cache.RedisCache'}}):
+            self.assertEqual(check_replica_pin_cache(None), [])
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'healthcare'))
+        self.assertIsNone(self.router.allow_migrate('default', 'healthcare'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class MirroredReplicaTestCases(TransactionTestCase):
+    """
+        Runs the reads against a real second alias, a mirror of default
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The test database through another connection, like a replica
+        connections.databases['replica'] = {
+            **connections['default'].settings_dict,
+            'TEST': {**connections['default'].settings_dict['TEST'], 'MIRROR': 'default'},
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+
+    def test_reads_run_on_the_replica(self):
+        with CaptureQueriesContext(connections['replica']) as replica_queries, read_from_replica(self.user):
+            self.assertEqual(get_user_model().objects.get(pk=self.user.pk).email, 'reader@example.com')
+        self.assertEqual(len(replica_queries), 1)
+
+    def test_graph_reads_the_replica_and_the_latest_record_the_primary(self):
+        from healthcare.cache import get_latest_record
+        from healthcare.models import BloodPressure
+
+        BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
+        cache.delete(PINNED_KEY.format(user_id=self.user.pk))
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.get(reverse('healthcare:blood_pressure_graph'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_queries)
+
+        with CaptureQueriesContext(connections['replica']) as replica_queries, \
+                CaptureQueriesContext(connections['default']) as primary_queries, read_from_replica(self.user):
+            self.assertEqual(get_latest_record(BloodPressure, self.user).pressure, "119/70")
+        self.assertEqual(len(replica_queries), 0)
+        self.assertEqual(len(primary_queries), 1)
+
+
+class NoReplicaRouterTestCases(TestCase):
+
+    def test_everything_uses_default(self):
+        with read_from_replica() as alias:
+            self.assertIsNone(alias)
+            self.assertEqual(get_user_model().objects.all().db, 'default')
+
+
+class ConnectionHealthCheckTestCases(TransactionTestCase):
+    """
+        Makes sure dropped persistent connections are replaced before the request
+    """
+
+    def setUp(self):
+        self.middleware = ConnectionHealthCheckMiddleware(lambda request: HttpResponse())
+        self.request = RequestFactory().get('/')
+        self.conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.settings_dict['CONN_MAX_AGE'] = 600
+        connection.ensure_connection()
+
+    def tearDown(self):
+        connection.settings_dict['CONN_MAX_AGE'] = self.conn_max_age
+
+    def test_unusable_connections_are_closed(self):
+        # The in-memory test database ignores close(), only check it is called
+        with mock.patch.object(connection, 'is_usable', return_value=False), \
+                mock.patch.object(connection, 'close') as close:
+            self.middleware(self.request)
+        close.assert_called_once_with()
+
+    def test_usable_and_per_request_connections_are_kept(self):
+        self.middleware(self.request)
+        self.assertIsNotNone(connection.connection)
+
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        with mock.patch.object(connection, 'is_usable', return_value=False) as is_usable:
+            self.middleware(self.request)
+        is_usable.assert_not_called()
+        self.assertIsNotNone(connection.connection)
@@ -20,5 +20,6 @@ from django.views.generic.base import RedirectView
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('users.urls')),
+    path('', include('healthcare.urls')),
     path('', RedirectView.as_view(pattern_name='users:login')),
 ]
@@ -0,0 +1,221 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+from .models import BloodPressure, BodyPhysique, DailyHealthSummary
+
+BUCKETS = {
+    'day': TruncDate,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+# Upper bound of points per series sent to the graphs
+MAX_POINTS = 300
+
+BLOOD_PRESSURE_METRICS = {
+    'systolic': 'systolic_pressure',
+    'diastolic': 'diastolic_pressure',
+}
+
+BODY_PHYSIQUE_METRICS = {
+    'weight': 'weight_in_kilograms',
+    'bmi': 'stored_bmi',
+}
+
+
+def pick_bucket(from_date, until_date, requested=None):
+    """
+        The smallest bucket, no finer than the requested one, that keeps the
+        range under MAX_POINTS points
+    """
+    days = (until_date - from_date).days + 1
+    local_from_date = timezone.localtime(from_date)
+    local_until_date = timezone.localtime(until_date)
+    years = local_until_date.year - local_from_date.year + 1
+    # Points of every bucket over the range, from the finest
+    points = {
+        'day': days,
+        'week': days // 7 + 1,
+        'month': (years - 1) * 12 + local_until_date.month - local_from_date.month + 1,
+        'year': years,
+    }
+    buckets = list(BUCKETS)
+    if requested:
+        buckets = buckets[buckets.index(requested):]
+
+    for bucket in buckets:
+        if points[bucket] <= MAX_POINTS:
+            return bucket
+    return buckets[-1]
+
+
+def _bucket_date(value):
+    # Week and month buckets come back as datetimes in the current timezone
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date()
+    return value
+
+
+def local_day_start(day):
+    """
+        The first moment of a date in the current timezone
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _number(value):
+    if value is None:
+        return None
+    return float(value)
+
+
+def _rounded(point):
+    return {key: ({name: round(number, 2) if number is not None else None for name, number in value.items()}
+                  if isinstance(value, dict) else value)
+            for key, value in point.items()}
+
+
+def _bucket_rows(queryset, metrics, bucket):
+    aggregates = {'count': Count('pk')}
+    for name, expression in metrics.items():
+        aggregates[f'{name}_min'] = Min(expression)
+        aggregates[f'{name}_max'] = Max(expression)
+        aggregates[f'{name}_mean'] = Avg(expression)
+
+    rows = (queryset.order_by()
+            .annotate(bucket=BUCKETS[bucket]('record_date'))
+            .values('bucket')
+            .annotate(**aggregates)
+            .order_by('bucket'))
+
+    return [
+        {
+            'bucket': _bucket_date(row['bucket']),
+            'count': row['count'],
+            **{name: {'min': _number(row[f'{name}_min']),
+                      'max': _number(row[f'{name}_max']),
+                      'mean': _number(row[f'{name}_mean'])}
+               for name in metrics}
+        }
+        for row in rows
+    ]
+
+
+def aggregate_buckets(queryset, metrics, bucket):
+    """
+        Min, max, mean and count of every metric per bucket, oldest first,
+        computed from the raw records
+    """
+    return [_rounded(point) for point in _bucket_rows(queryset, metrics, bucket)]
+
+
+def _summary_rows(user, prefix, metrics, first_day, last_day):
+    summaries = DailyHealthSummary.objects.filter(
+        user=user, day__gte=first_day, day__lte=last_day, **{f'{prefix}_count__gt': 0}
+    ).order_by('day')
+
+    return [
+        {
+            'bucket': summary.day,
+            'count': getattr(summary, f'{prefix}_count'),
+            **{name: {'min': getattr(summary, f'{name}_min'),
+                      'max': getattr(summary, f'{name}_max'),
+                      'mean': getattr(summary, f'{name}_mean')}
+               for name in metrics}
+        }
+        for summary in summaries
+    ]
+
+
+def _full_days(from_date, until_date):
+    """
+        The first and last local dates entirely inside the range
+    """
+    local_from_date = timezone.localtime(from_date)
+    local_until_date = timezone.localtime(until_date)
+
+    first_day = local_from_date.date()
+    if local_from_date.time() != time.min:
+        first_day += timedelta(days=1)
+
+    last_day = local_until_date.date()
+    # The date range mixin ends the range at 23:59:59
+    if local_until_date.time() < time(23, 59, 59):
+        last_day -= timedelta(days=1)
+
+    return first_day, last_day
+
+
+def _bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def merge_points(points, bucket, metrics):
+    """
+        Merges daily points into bigger buckets, means are weighted by count
+    """
+    merged = {}
+    for point in sorted(points, key=lambda point: point['bucket']):
+        key = _bucket_start(point['bucket'], bucket)
+        if key not in merged:
+            merged[key] = {'bucket': key, 'count': 0,
+                           **{name: {'min': None, 'max': None, 'mean': None} for name in metrics}}
+        target = merged[key]
+        count = target['count'] + point['count']
+
+        for name in metrics:
+            current, new = target[name], point[name]
+            if new['mean'] is None:
+                continue
+            if current['mean'] is None:
+                current.update(new)
+                continue
+            current['min'] = min(current['min'], new['min'])
+            current['max'] = max(current['max'], new['max'])
+            current['mean'] = (current['mean'] * target['count'] + new['mean'] * point['count']) / count
+
+        target['count'] = count
+    return list(merged.values())
+
+
+def summarized_series(model, user, from_date, until_date, bucket=None):
+    """
+        The bucketed series of a record model. Full days are read from the
+        daily summaries, only the partial days at the edges touch raw records.
+    """
+    prefix = model.record_type_name
+    metrics = BLOOD_PRESSURE_METRICS if model is BloodPressure else BODY_PHYSIQUE_METRICS
+    # A requested bucket too fine for the range is coarsened
+    bucket = pick_bucket(from_date, until_date, bucket)
+    first_day, last_day = _full_days(from_date, until_date)
+    records = model.active_objects.filter(user=user)
+
+    if first_day > last_day:
+        points = _bucket_rows(records.filter(record_date__gte=from_date, record_date__lte=until_date),
+                              metrics, 'day')
+    else:
+        edges = records.filter(
+            Q(record_date__gte=from_date, record_date__lt=local_day_start(first_day)) |
+            Q(record_date__gte=local_day_start(last_day + timedelta(days=1)), record_date__lte=until_date)
+        )
+        points = _bucket_rows(edges, metrics, 'day') + _summary_rows(user, prefix, metrics, first_day, last_day)
+
+    return bucket, [_rounded(point) for point in merge_points(points, bucket, metrics)]
+
+
+def blood_pressure_series(user, from_date, until_date, bucket=None):
+    return summarized_series(BloodPressure, user, from_date, until_date, bucket)
+
+
+def body_physique_series(user, from_date, until_date, bucket=None):
+    return summarized_series(BodyPhysique, user, from_date, until_date, bucket)
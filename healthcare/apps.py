@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class HealthcareConfig(AppConfig):
     name = 'healthcare'
+
+    def ready(self):
+        # Connects the records_changed receivers
+        from . import rollups  # noqa: F401
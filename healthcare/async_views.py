@@ -0,0 +1,126 @@
+import asyncio
+
+from django.http import JsonResponse
+from django.views.generic import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core.async_utils import AsyncViewMixin, database_sync_to_async
+from core.date_ranges import InvalidDateRange
+from core.routers import read_from_replica
+
+from .aggregations import BUCKETS, blood_pressure_series, body_physique_series
+from .mixins import ApiDateRangeMixin, BloodPressureMixin, BodyPhysiqueMixin
+
+NOT_AUTHENTICATED = {"detail": "Authentication credentials were not provided."}
+
+
+def _authenticate(request):
+    """
+        Runs the DRF authenticators of the settings (session, JWT, basic) like
+        the sync api views do. Returns the user, or None and the error detail.
+    """
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        user = Request(request, authenticators=authenticators).user
+    except exceptions.APIException as e:
+        return None, {"detail": e.detail}
+    if not user.is_authenticated:
+        return None, NOT_AUTHENTICATED
+    return user, None
+
+
+def _blood_pressure_reading(record):
+    if record is None:
+        return None
+    return {
+        "id": record.pk,
+        "record_date": record.record_date,
+        "pressure": record.pressure,
+        "state": record.state,
+    }
+
+
+def _body_physique_reading(record):
+    if record is None:
+        return None
+    return {
+        "id": record.pk,
+        "record_date": record.record_date,
+        "height": str(record.height),
+        "weight": str(record.weight),
+        "bmi": str(record.bmi),
+        "state": record.bmi_state,
+    }
+
+
+class AsyncGraphView(AsyncViewMixin, ApiDateRangeMixin, View):
+    """
+        Async version of GraphApiView, the worker serves other requests
+        while the series is read
+    """
+    series = None
+
+    def read_series(self, user, from_date, until_date, bucket):
+        with read_from_replica(user):
+            return self.series(user, from_date, until_date, bucket)
+
+    async def get(self, request, *args, **kwargs):
+        user, error = await database_sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse(error, status=403)
+
+        bucket = request.GET.get("bucket", None)
+        if bucket and bucket not in BUCKETS:
+            return JsonResponse({"bucket": f"Use one of: {', '.join(BUCKETS)}"}, status=400)
+
+        try:
+            from_date, until_date = self.extract_from_date_and_until_date()
+        except InvalidDateRange as e:
+            return JsonResponse({"date_range": str(e)}, status=400)
+
+        bucket, points = await database_sync_to_async(self.read_series)(user, from_date, until_date, bucket)
+
+        return JsonResponse({
+            "from_date": from_date,
+            "until_date": until_date,
+            "bucket": bucket,
+            "points": points,
+        })
+
+
+class AsyncBloodPressureGraphView(AsyncGraphView):
+    """
+        Systolic and diastolic pressures over time
+    """
+    series = staticmethod(blood_pressure_series)
+
+
+class AsyncBodyPhysiqueGraphView(AsyncGraphView):
+    """
+        Weight and bmi over time
+    """
+    series = staticmethod(body_physique_series)
+
+
+class AsyncLatestReadingsView(AsyncViewMixin, BloodPressureMixin, BodyPhysiqueMixin, View):
+    """
+        The user's latest blood pressure and body physique, both are read
+        at the same time
+    """
+
+    async def get(self, request, *args, **kwargs):
+        user, error = await database_sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse(error, status=403)
+
+        blood_pressure, body_physique = await asyncio.gather(
+            database_sync_to_async(self.get_user_latest_blood_pressure)(user),
+            database_sync_to_async(self.get_user_latest_body_physique)(user),
+        )
+
+        return JsonResponse({
+            "blood_pressure": _blood_pressure_reading(blood_pressure),
+            "body_physique": _body_physique_reading(body_physique),
+        })
@@ -0,0 +1,190 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.dispatch import receiver
+
+from core.routers import pin_to_primary
+
+from .signals import records_changed
+
+# Keyed by the record type name and the user id
+LATEST_RECORD_KEY = "healthcare:latest:{record_type_name}:{user_id}"
+
+# Bumped whenever one of the user's records changes
+RECORD_VERSION_KEY = "healthcare:version:{user_id}"
+
+
+def _latest_record_key(record_type_name, user_id):
+    return LATEST_RECORD_KEY.format(record_type_name=record_type_name, user_id=user_id)
+
+
+def _latest_record_timeout():
+    return getattr(settings, 'HEALTHCARE_LATEST_RECORD_TIMEOUT', 60 * 60 * 24)
+
+
+def _field_names(model):
+    return tuple(field.attname for field in model._meta.concrete_fields)
+
+
+def _pack_record(model, record):
+    """
+        The field values of the latest record, None when there is none. Plain
+        values outlive a change to the model better than a pickled instance.
+    """
+    names = _field_names(model)
+    return {'fields': names, 'values': None if record is None else [getattr(record, name) for name in names]}
+
+
+def _cached_values(model, cached):
+    """
+        The cached field values by name or None for no record. Raises
+        KeyError when they were cached with other fields.
+    """
+    if cached.get('fields') != _field_names(model):
+        raise KeyError("Cached with other fields")
+    if cached['values'] is None:
+        return None
+    return dict(zip(cached['fields'], cached['values']))
+
+
+def get_latest_record(model, user):
+    """
+        Gets the user's latest active record of a child record model.
+        Reads the cache first and only queries the primary on a miss.
+    """
+    key = _latest_record_key(model.record_type_name, user.pk)
+
+    cached = cache.get(key)
+    if cached is not None:
+        try:
+            values = _cached_values(model, cached)
+        except KeyError:
+            # Cached before the fields of the model changed, read it again
+            pass
+        else:
+            if values is None:
+                return None
+            return model.from_db(router.db_for_write(model), cached['fields'], cached['values'])
+
+    # Filled from the primary, a lagging replica would be cached for a day
+    records = model.active_objects.using(router.db_for_write(model))
+    latest = records.filter(user=user).of_type(model.record_type_name).order_by('record_date').last()
+    cache.set(key, _pack_record(model, latest), _latest_record_timeout())
+    return latest
+
+
+def record_saved(record, using=None):
+    """
+        Keeps the latest record cache in sync once the save is committed
+    """
+    transaction.on_commit(lambda: _update_latest_record(record), using=using)
+
+
+def forget_latest_records(user_ids, record_type_name, using=None):
+    """
+        Drops the cached latest records of many users once committed, used by
+        the bulk operations that do not go through save()
+    """
+    keys = [_latest_record_key(record_type_name, user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys), using=using)
+
+
+def get_record_version(user_id):
+    """
+        The version of a user's records, anything cached under it stays valid
+        until the records change
+    """
+    key = RECORD_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a lost counter never goes back to a used version
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_record_versions(user_ids, using=None):
+    """
+        Moves the users to a new record version once the change is committed
+    """
+    keys = [RECORD_VERSION_KEY.format(user_id=user_id) for user_id in user_ids]
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Not cached, the next read starts a new version
+                pass
+
+    transaction.on_commit(bump, using=using)
+
+
+def dashboard_timeout():
+    return getattr(settings, 'HEALTHCARE_DASHBOARD_TIMEOUT', 60 * 60)
+
+
+def _record_type_name(record):
+    if record.record_type_name:
+        return record.record_type_name
+    # The parent HealthRecord, only the stored type is known
+    return {value: name for name, value in record.record_types.items()}.get(record.record_type)
+
+
+def _update_latest_record(record):
+    record_type_name = _record_type_name(record)
+    if record_type_name is None:
+        return
+
+    key = _latest_record_key(record_type_name, record.user_id)
+    cached = cache.get(key)
+    if cached is None:
+        # Nothing cached yet, the next read will fill it
+        return
+
+    if not record.record_type_name or not record.is_active:
+        # Saved through the parent, restored or deactivated, read it again
+        cache.delete(key)
+        return
+
+    model = type(record)
+    try:
+        latest = _cached_values(model, cached)
+    except KeyError:
+        cache.delete(key)
+        return
+
+    if latest is None or latest['record_date'] <= record.record_date:
+        # Write through, the saved record is the newest one
+        cache.set(key, _pack_record(model, record), _latest_record_timeout())
+    elif latest[model._meta.pk.attname] == record.pk:
+        # The cached record moved back in time, read it again
+        cache.delete(key)
+
+
+def record_deleted(record, using=None):
+    """
+        Drops the cached latest record and moves the user to a new record
+        version once a hard delete is committed
+    """
+    record_type_name = _record_type_name(record)
+    if record_type_name is not None:
+        forget_latest_records([record.user_id], record_type_name, using=using)
+    bump_record_versions([record.user_id], using=using)
+
+
+@receiver(records_changed)
+def pin_writers_to_primary(sender, user_days, using=None, **kwargs):
+    """
+        Users whose records changed read from the primary for a while, the
+        replicas may not have the change yet
+    """
+    for user_id in user_days:
+        pin_to_primary(user_id)
+
+
+@receiver(records_changed)
+def bump_writers_record_versions(sender, user_days, using=None, **kwargs):
+    bump_record_versions(list(user_days), using=using)
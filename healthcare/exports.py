@@ -0,0 +1,88 @@
+import csv
+import json
+
+from itertools import islice
+
+from .models import BloodPressure, HealthRecord
+
+EXPORT_FIELDS = [
+    'id', 'record_type', 'formatted_record_date', 'pressure', 'height', 'weight', 'bmi', 'state', 'details'
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """
+        A file like object that returns what is written, lets the csv writer
+        feed a streaming response
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(user, chunk_size=2000, using=None):
+    """
+        Yields the active health records of a user as dictionaries, oldest
+        first. Records are read and computed chunk by chunk so the memory
+        stays flat no matter how long the history is.
+    """
+    records = HealthRecord.active_objects.using(using).filter(user=user).with_children().order_by('record_date', 'pk')
+    records = records.iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = [record.concrete_record or record for record in islice(records, chunk_size)]
+        if not chunk:
+            break
+
+        blood_pressures = [record for record in chunk if isinstance(record, BloodPressure)]
+        states = dict(zip((record.pk for record in blood_pressures), BloodPressure.states_of(blood_pressures)))
+
+        for record in chunk:
+            row = {
+                'id': record.pk,
+                'record_type': record.record_type_name,
+                'formatted_record_date': record.formatted_record_date,
+                'pressure': None,
+                'height': None,
+                'weight': None,
+                'bmi': None,
+                'state': states.get(record.pk) or record.state,
+                'details': record.details,
+            }
+            if record.record_type_name == "blood_pressure":
+                row['pressure'] = record.pressure
+            elif record.record_type_name == "body_physique":
+                row['height'] = str(record.height)
+                row['weight'] = str(record.weight)
+                row['bmi'] = str(record.bmi)
+            yield row
+
+
+def export_csv(rows):
+    """
+        Yields the rows as csv lines, header first
+    """
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_ndjson(rows):
+    """
+        Yields the rows as newline delimited json
+    """
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def export_lines(user, export_format, chunk_size=2000, using=None):
+    rows = export_rows(user, chunk_size=chunk_size, using=using)
+    if export_format == 'ndjson':
+        return export_ndjson(rows)
+    return export_csv(rows)
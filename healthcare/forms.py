@@ -0,0 +1,11 @@
+from django import forms
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+
+class WeightCheckInForm(forms.Form):
+    weight_in_kilograms = forms.DecimalField(max_digits=5, decimal_places=2, required=True,
+                                             validators=[MinValueValidator(1), MaxValueValidator(999)])
+    # Carried forward from the latest body physique when left empty
+    height_in_centimeters = forms.DecimalField(max_digits=5, decimal_places=2, required=False,
+                                               validators=[MinValueValidator(1), MaxValueValidator(999)])
+    details = forms.CharField(required=False)
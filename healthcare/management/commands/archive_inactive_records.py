@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+from django.utils import timezone
+
+from healthcare.models import ArchivedHealthRecord, HealthRecord
+
+
+class Command(BaseCommand):
+    """
+        Moves the health records deactivated for longer than --days into
+        ArchivedHealthRecord, batch by batch so each transaction stays short
+    """
+    help = "Archives the long deactivated health records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help="Days since the record was deactivated")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        database = router.db_for_write(HealthRecord)
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+
+        inactive = HealthRecord.objects.using(database).filter(is_active=False, date_updated__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f"{inactive.count()} records would be archived")
+            return
+
+        archived = 0
+        while True:
+            with transaction.atomic(using=database):
+                batch = list(inactive.with_children().order_by('pk')[:batch_size])
+                if not batch:
+                    break
+
+                ArchivedHealthRecord.objects.using(database).bulk_create(
+                    [ArchivedHealthRecord.from_record(record) for record in batch])
+                # Deactivated records are not in the caches, the daily summaries nor the profiles,
+                # the post_delete receiver skips them
+                HealthRecord.objects.using(database).filter(pk__in=[record.pk for record in batch]).delete()
+
+            archived += len(batch)
+            self.stdout.write(f"Archived {archived} records")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} records older than {options['days']} days"))
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.shortcuts import reverse
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+
+from healthcare.models import BloodPressure, BodyPhysique
+
+
+class Command(BaseCommand):
+    """
+        Load tests one sync worker (the WSGI handler, one request at a time)
+        against one event loop (the ASGI handler with the async views) on
+        the same number of requests. Each query waits --latency seconds to
+        stand for the round trip to a database server.
+
+        Run it against a throwaway database, the benchmark user is removed
+        at the end.
+    """
+    help = "Compares requests per second of the sync and async latest reading and graph views"
+
+    username = "benchmark-async-views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--latency', type=float, default=0.005, help="Seconds added to every query")
+
+    def handle(self, *args, **options):
+        self.latency = options['latency']
+        user = self.create_user()
+        connection_created.connect(self.add_latency)
+        for alias in connections:
+            self.add_latency(None, connections[alias])
+
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                sync_urls = [reverse('healthcare:blood_pressure_graph')]
+                async_urls = [reverse('healthcare:async_blood_pressure_graph'),
+                              reverse('healthcare:async_latest_readings')]
+
+                count = options['requests']
+                self.report("sync graph (WSGI)", count, self.run_sync(sync_urls, user, count))
+                for label, url in (("async graph (ASGI)", async_urls[0]),
+                                   ("async latest readings (ASGI)", async_urls[1])):
+                    elapsed = asyncio.run(self.run_async([url], user, count, options['concurrency']))
+                    self.report(label, count, elapsed)
+                self.stdout.write("The async views run their queries on the default executor, "
+                                  "size it with the ASGI_THREADS environment variable.")
+        finally:
+            connection_created.disconnect(self.add_latency)
+            user.delete()
+
+    def add_latency(self, sender, connection, **kwargs):
+        if self.wait not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.wait)
+
+    def wait(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def create_user(self):
+        User = get_user_model()
+        User.objects.filter(username=self.username).delete()
+        user = User.objects.create_user(self.username)
+        now = timezone.now()
+        BloodPressure.objects.bulk_ingest([
+            {'user': user, 'systolic_pressure': 110 + day % 30, 'diastolic_pressure': 70 + day % 15,
+             'record_date': now - timedelta(days=day)}
+            for day in range(60)
+        ])
+        BodyPhysique.objects.create(user=user, height_in_centimeters=170, weight_in_kilograms=70)
+        return user
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label}: {count} requests in {elapsed:.2f}s, {count / elapsed:.1f} requests/s")
+
+    def run_sync(self, urls, user, count):
+        client = Client()
+        client.force_login(user)
+        start = time.perf_counter()
+        for number in range(count):
+            response = client.get(urls[number % len(urls)])
+            assert response.status_code == 200, response.status_code
+        return time.perf_counter() - start
+
+    async def run_async(self, urls, user, count, concurrency):
+        client = AsyncClient()
+        await asyncio.get_running_loop().run_in_executor(None, client.force_login, user)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(number):
+            async with semaphore:
+                response = await client.get(urls[number % len(urls)])
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(number) for number in range(count)))
+        return time.perf_counter() - start
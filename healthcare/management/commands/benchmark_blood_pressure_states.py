@@ -0,0 +1,71 @@
+import random
+import time
+from array import array
+
+from django.core.management.base import BaseCommand
+
+from healthcare.models import BloodPressure
+
+
+class Command(BaseCommand):
+    """
+        Compares the per instance state property against
+        BloodPressure.classify_many on synthetic readings
+    """
+    help = "Benchmarks blood pressure classification"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=3, help="Runs of each method, the fastest is reported")
+
+    def best_of(self, repeat, function, *args):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(*args)
+            timings.append(time.perf_counter() - start)
+        return result, min(timings)
+
+    def classify_with_property(self, systolic, diastolic):
+        # Reuse one instance so only the property itself is measured
+        reading = BloodPressure()
+        states = []
+        for systolic_pressure, diastolic_pressure in zip(systolic, diastolic):
+            reading.systolic_pressure = systolic_pressure
+            reading.diastolic_pressure = diastolic_pressure
+            states.append(reading.state)
+        return states
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = options['repeat']
+        generator = random.Random(options['seed'])
+
+        # Validated pressures fit unsigned shorts, the natural column type
+        systolic = array('H', (generator.randint(60, 200) for _ in range(count)))
+        diastolic = array('H', (generator.randint(40, 130) for _ in range(count)))
+
+        expected, property_time = self.best_of(repeat, self.classify_with_property, systolic, diastolic)
+        self.stdout.write(f"Readings: {count}, fastest of {repeat} runs")
+        self.stdout.write(f"state property: {property_time:.3f}s")
+
+        columns = [
+            ("array('H')", systolic, diastolic),
+            ("array('i')", array('i', systolic), array('i', diastolic)),
+        ]
+        try:
+            import numpy
+        except ImportError:
+            pass
+        else:
+            columns.append(("numpy", numpy.array(systolic, dtype=numpy.int32),
+                            numpy.array(diastolic, dtype=numpy.int32)))
+
+        for label, systolic_column, diastolic_column in columns:
+            classified, batch_time = self.best_of(repeat, BloodPressure.classify_many,
+                                                  systolic_column, diastolic_column)
+            if classified != expected:
+                self.stderr.write(f"classify_many does not match the state property on {label} columns!")
+                return
+            self.stdout.write(f"classify_many ({label}): {batch_time:.3f}s ({property_time / batch_time:.1f}x)")
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.date_ranges import DateRangeResolver
+
+
+def legacy_get_last_month(today_date):
+    # ApiDateRangeMixin.get_last_month before the date range resolver
+    last_full_month = today_date
+    last_month = today_date.month - 1
+
+    if last_month == 0:
+        last_month = 1
+
+    invalid = True
+    to_substract = 0
+    while invalid and to_substract < 33:
+        try:
+            last_full_month = today_date.replace(month=last_month, day=today_date.day - to_substract)
+            invalid = False
+        except ValueError as e:
+            print(e)
+            to_substract += 1
+
+    return last_full_month
+
+
+def legacy_extract(from_date, until_date):
+    # ApiDateRangeMixin.extract_from_date_and_until_date before the date range resolver
+    today_date = timezone.localtime()
+    last_month = legacy_get_last_month(today_date)
+
+    if from_date:
+        from_date = timezone.localtime(timezone.make_aware(datetime.strptime(from_date, "%Y-%m-%d")))
+    else:
+        from_date = last_month
+
+    if until_date:
+        until_date = timezone.localtime(timezone.make_aware(datetime.strptime(until_date, "%Y-%m-%d")))
+        until_date = until_date.replace(hour=23, minute=59, second=59)
+    else:
+        until_date = today_date
+
+    return from_date, until_date
+
+
+class Command(BaseCommand):
+    """
+        Compares the old graph api date range parsing against
+        DateRangeResolver on random date ranges
+    """
+    help = "Benchmarks date range parsing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        generator = random.Random(options['seed'])
+        first_day = date(2015, 1, 1)
+
+        ranges = []
+        for _ in range(count):
+            start = first_day + timedelta(days=generator.randint(0, 3000))
+            end = start + timedelta(days=generator.randint(0, 400))
+            ranges.append((start.isoformat(), end.isoformat()))
+
+        # The old code prints on every retry, keep that out of the terminal
+        # but inside the measurement
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = [legacy_extract(from_date, until_date) for from_date, until_date in ranges]
+            for _ in range(count):
+                legacy_extract(None, None)
+        legacy_time = time.perf_counter() - start
+
+        resolver = DateRangeResolver()
+        start = time.perf_counter()
+        resolved = [resolver.resolve(from_date, until_date) for from_date, until_date in ranges]
+        for _ in range(count):
+            resolver.resolve()
+        resolver_time = time.perf_counter() - start
+
+        if resolved != expected:
+            self.stderr.write("DateRangeResolver does not match the old parsing!")
+            return
+
+        self.stdout.write(f"Requests: {count} with dates, {count} without")
+        self.stdout.write(f"old mixin: {legacy_time:.3f}s")
+        self.stdout.write(f"DateRangeResolver: {resolver_time:.3f}s ({legacy_time / resolver_time:.1f}x)")
@@ -0,0 +1,158 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from healthcare.models import BloodPressure, HealthRecord
+
+
+class Command(BaseCommand):
+    """
+        Fills the database with synthetic blood pressure records then shows
+        the query plans and latencies of the per user lookups without and
+        with the HealthRecord indexes.
+
+        Run it against a throwaway database, the synthetic rows are removed
+        at the end unless --keep is passed. It drops and recreates the
+        HealthRecord indexes of the configured database, so it refuses to run
+        without --drop-indexes.
+    """
+    help = "Benchmarks the per user record lookups with and without the HealthRecord indexes"
+
+    username_prefix = "benchmark-user-"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true')
+        parser.add_argument('--drop-indexes', action='store_true',
+                            help="Confirms the HealthRecord indexes of the database may be dropped while measuring")
+
+    def handle(self, *args, **options):
+        self.generator = random.Random(options['seed'])
+        self.database = router.db_for_write(HealthRecord)
+        connection = connections[self.database]
+
+        if not options['drop_indexes']:
+            raise CommandError(
+                f"This drops the HealthRecord indexes of the {connection.settings_dict['NAME']} database while "
+                f"it measures, pass --drop-indexes to confirm it is a throwaway database."
+            )
+
+        users = self.create_users(options['users'])
+        self.stdout.write(f"Inserting {options['rows']} records for {len(users)} users...")
+        self.create_records(users, options['rows'])
+
+        sample = [self.generator.choice(users) for _ in range(options['queries'])]
+        indexes = HealthRecord._meta.indexes
+
+        try:
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.remove_index(HealthRecord, index)
+            self.stdout.write(self.style.MIGRATE_HEADING("Without indexes"))
+            self.measure(sample)
+        finally:
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.add_index(HealthRecord, index)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("With indexes"))
+        self.measure(sample)
+
+        if not options['keep']:
+            self.cleanup()
+
+    def create_users(self, count):
+        User = get_user_model()
+        User.objects.using(self.database).bulk_create(
+            [User(username=f"{self.username_prefix}{number}") for number in range(count)],
+            ignore_conflicts=True
+        )
+        return list(User.objects.using(self.database).filter(username__startswith=self.username_prefix))
+
+    def create_records(self, users, rows):
+        connection = connections[self.database]
+        now = timezone.now()
+        parent_fields = HealthRecord._meta.local_concrete_fields
+        child_fields = BloodPressure._meta.local_concrete_fields
+        batch_size = connection.ops.bulk_batch_size(parent_fields, [None]) or 1000
+        batch_size = min(batch_size, 5000)
+
+        # Explicit ids so the child rows can point to their parents on every backend
+        last = HealthRecord.objects.using(self.database).order_by('pk').last()
+        next_id = last.pk + 1 if last else 1
+
+        inserted = 0
+        while inserted < rows:
+            records = []
+            for _ in range(min(batch_size, rows - inserted)):
+                record_date = now - timedelta(minutes=self.generator.randint(0, 5 * 365 * 24 * 60))
+                record = BloodPressure(
+                    id=next_id,
+                    healthrecord_ptr_id=next_id,
+                    user_id=self.generator.choice(users).pk,
+                    record_date=record_date,
+                    created=now,
+                    date_updated=now,
+                    details="No details available",
+                    record_type=HealthRecord.record_types.get("blood_pressure"),
+                    is_active=self.generator.random() > 0.05,
+                    systolic_pressure=self.generator.randint(80, 190),
+                    diastolic_pressure=self.generator.randint(50, 125),
+                )
+                records.append(record)
+                next_id += 1
+
+            with transaction.atomic(using=self.database):
+                HealthRecord._base_manager.using(self.database)._insert(records, fields=parent_fields, raw=True)
+                BloodPressure._base_manager.using(self.database)._insert(records, fields=child_fields, raw=True)
+            inserted += len(records)
+
+        # Explicit ids do not move the id sequence on postgres, the next save() would reuse them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [HealthRecord]):
+                cursor.execute(sql)
+
+    def measure(self, users):
+        # Fresh statistics so the planner knows about the synthetic rows
+        with connections[self.database].cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        until_date = timezone.now()
+        from_date = until_date - timedelta(days=30)
+
+        def latest(user):
+            return BloodPressure.active_objects.using(self.database).filter(
+                user=user).blood_pressures().order_by('record_date').reverse()[:1]
+
+        def date_range(user):
+            return HealthRecord.active_objects.using(self.database).filter(
+                user=user, record_date__gte=from_date, record_date__lte=until_date).order_by('record_date')
+
+        for name, build in (("latest blood pressure", latest), ("30 day range", date_range)):
+            self.stdout.write(f"{name}:")
+            self.stdout.write(build(users[0]).explain())
+
+            start = time.perf_counter()
+            for user in users:
+                list(build(user))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{len(users)} queries, {elapsed * 1000 / len(users):.3f}ms per query\n")
+
+    def cleanup(self):
+        User = get_user_model()
+        users = User.objects.using(self.database).filter(username__startswith=self.username_prefix)
+        records = HealthRecord.objects.using(self.database).filter(user__in=users)
+        # Raw deletes, the collector would load every synthetic row in memory
+        with transaction.atomic(using=self.database):
+            BloodPressure.objects.using(self.database).filter(pk__in=records.values('pk'))._raw_delete(self.database)
+            records._raw_delete(self.database)
+            users._raw_delete(self.database)
@@ -0,0 +1,123 @@
+import statistics
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.shortcuts import reverse
+from django.test import Client, override_settings
+
+from healthcare.models import BloodPressure
+
+# name, CONN_MAX_AGE, SESSION_ENGINE, extra middleware
+PROFILES = (
+    ("per request connections, db sessions", 0, 'django.contrib.sessions.backends.db', []),
+    ("persistent connections, cached_db sessions", 600, 'django.contrib.sessions.backends.cached_db',
+     ['core.middleware.ConnectionHealthCheckMiddleware']),
+)
+
+
+class Command(BaseCommand):
+    """
+        Sends authenticated graph requests through the WSGI handler, which
+        (unlike the test client) opens and closes database connections the
+        way a server does. Opening a connection waits --connect-latency and
+        every query --latency seconds, to stand for the handshake with and
+        the round trips to a database server.
+
+        Run it against a throwaway database, the benchmark user is removed
+        at the end.
+    """
+    help = "Compares per request latency of per request connections and db sessions against " \
+           "core.production_settings (persistent connections, cached_db sessions)"
+
+    username = "benchmark-requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.0005, help="Seconds added to every query")
+        parser.add_argument('--connect-latency', type=float, default=0.01,
+                            help="Seconds added to opening a connection")
+
+    def handle(self, *args, **options):
+        self.latency = options['latency']
+        self.connect_latency = options['connect_latency']
+        user = self.create_user()
+        conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection_created.connect(self.add_latency)
+
+        try:
+            for label, max_age, session_engine, middleware in PROFILES:
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                with override_settings(ALLOWED_HOSTS=['testserver'], SESSION_ENGINE=session_engine,
+                                       MIDDLEWARE=middleware + settings.MIDDLEWARE):
+                    timings = self.run(user, options['requests'])
+                self.report(label, timings)
+        finally:
+            connection_created.disconnect(self.add_latency)
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+            user.delete()
+
+    def add_latency(self, sender, connection, **kwargs):
+        time.sleep(self.connect_latency)
+        if self.wait not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.wait)
+
+    def wait(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def create_user(self):
+        User = get_user_model()
+        User.objects.filter(username=self.username).delete()
+        user = User.objects.create_user(self.username)
+        BloodPressure.objects.create(user=user, systolic_pressure=110, diastolic_pressure=70)
+        return user
+
+    def environ(self, path, session_key):
+        return {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_COOKIE': f"{settings.SESSION_COOKIE_NAME}={session_key}",
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': self.stderr,
+        }
+
+    def run(self, user, count):
+        # Logs in with the session engine of the profile
+        client = Client()
+        client.force_login(user)
+        session_key = client.session.session_key
+        connection.close()
+
+        handler = WSGIHandler()
+        path = reverse('healthcare:blood_pressure_graph')
+        timings = []
+        for number in range(count):
+            start = time.perf_counter()
+            response = handler(self.environ(path, session_key), lambda status, headers: None)
+            content = b"".join(response)
+            # Sends request_finished, which closes non persistent connections
+            response.close()
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200 and content, response.status_code
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        self.stdout.write(
+            f"{label}: mean {statistics.mean(timings) * 1000:.2f}ms, "
+            f"median {statistics.median(timings) * 1000:.2f}ms, "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f}ms"
+        )
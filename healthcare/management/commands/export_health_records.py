@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from healthcare.exports import EXPORT_FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    """
+        Writes a user's whole health history as csv or ndjson, row by row
+    """
+    help = "Exports a user's health records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help="File to write to, defaults to stdout")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with the email {options['email']}")
+
+        lines = export_lines(user, options['format'], chunk_size=options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
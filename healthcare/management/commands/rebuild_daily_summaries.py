@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+from django.db.models import Exists, OuterRef
+
+from healthcare.models import DailyHealthSummary, HealthRecord
+from healthcare.rollups import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    """
+        Rebuilds every DailyHealthSummary from the health records, users are
+        split in chunks that are rebuilt in parallel
+    """
+    help = "Rebuilds the daily health summaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Users per chunk")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Parallel workers, defaults to 1 on SQLite and 4 elsewhere")
+
+    def handle(self, *args, **options):
+        database = router.db_for_write(DailyHealthSummary)
+        workers = options['workers'] or (1 if connections[database].vendor == 'sqlite' else 4)
+        chunk_size = options['chunk_size']
+
+        user_ids = list(HealthRecord.objects.using(database).order_by('user').values_list('user', flat=True).distinct())
+        chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+
+        # Users without records anymore, a subquery rather than every user id as a parameter
+        records = HealthRecord.objects.using(database).filter(user=OuterRef('user'))
+        DailyHealthSummary.objects.using(database).filter(~Exists(records)).delete()
+
+        if workers == 1:
+            for done, chunk in enumerate(chunks, 1):
+                rebuild_daily_summaries(chunk, using=database)
+                self.stdout.write(f"Rebuilt {done}/{len(chunks)} chunks")
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for done, _ in enumerate(executor.map(self.rebuild_chunk, chunks, [database] * len(chunks)), 1):
+                    self.stdout.write(f"Rebuilt {done}/{len(chunks)} chunks")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the daily summaries of {len(user_ids)} users"))
+
+    def rebuild_chunk(self, user_ids, database):
+        try:
+            rebuild_daily_summaries(user_ids, using=database)
+        finally:
+            # Each worker thread has its own connection
+            connections.close_all()
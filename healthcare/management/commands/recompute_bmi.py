@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from healthcare.models import BodyPhysique
+
+
+class Command(BaseCommand):
+    """
+        Recomputes the stored bmi and bmi state of every body physique,
+        for rows written without save() like queryset updates
+    """
+    help = "Recomputes the stored bmi of the body physique records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = BodyPhysique.recompute_stored_bmi(BodyPhysique.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed the bmi of {updated} records"))
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthrecord',
+            name='record_type',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'blood_pressure'), (1, 'body_physique')], db_index=True, editable=False, null=True),
+        ),
+    ]
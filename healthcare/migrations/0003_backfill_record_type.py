@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_record_type(apps, schema_editor):
+    """
+        Stores the record type of the records saved before record_type existed
+    """
+    HealthRecord = apps.get_model('healthcare', 'HealthRecord')
+    # Keep in sync with HealthRecord.record_types
+    HealthRecord.objects.filter(record_type__isnull=True, bloodpressure__isnull=False).update(record_type=0)
+    HealthRecord.objects.filter(record_type__isnull=True, bodyphysique__isnull=False).update(record_type=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0002_healthrecord_record_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_record_type, migrations.RunPython.noop),
+    ]
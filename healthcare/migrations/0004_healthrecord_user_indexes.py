@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0003_backfill_record_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['user', 'is_active', 'record_date'], name='healthrecord_user_active_date'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(condition=models.Q(is_active=True), fields=['user', 'record_type', 'record_date'], name='healthrecord_user_type_date'),
+        ),
+    ]
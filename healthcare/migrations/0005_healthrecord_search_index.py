@@ -0,0 +1,30 @@
+from django.db import migrations, OperationalError
+
+from healthcare.search import create_postgres_search_index, create_sqlite_search_index, drop_search_index
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        create_postgres_search_index(schema_editor)
+    elif vendor == 'sqlite':
+        try:
+            create_sqlite_search_index(schema_editor)
+        except OperationalError:
+            # SQLite built without FTS5, search falls back to icontains
+            pass
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0004_healthrecord_user_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('healthcare', '0005_healthrecord_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHealthSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('day', models.DateField()),
+                ('blood_pressure_count', models.PositiveIntegerField(default=0)),
+                ('systolic_min', models.IntegerField(blank=True, null=True)),
+                ('systolic_max', models.IntegerField(blank=True, null=True)),
+                ('systolic_mean', models.FloatField(blank=True, null=True)),
+                ('diastolic_min', models.IntegerField(blank=True, null=True)),
+                ('diastolic_max', models.IntegerField(blank=True, null=True)),
+                ('diastolic_mean', models.FloatField(blank=True, null=True)),
+                ('blood_pressure_state', models.CharField(blank=True, max_length=64, null=True)),
+                ('body_physique_count', models.PositiveIntegerField(default=0)),
+                ('weight_min', models.FloatField(blank=True, null=True)),
+                ('weight_max', models.FloatField(blank=True, null=True)),
+                ('weight_mean', models.FloatField(blank=True, null=True)),
+                ('bmi_min', models.FloatField(blank=True, null=True)),
+                ('bmi_max', models.FloatField(blank=True, null=True)),
+                ('bmi_mean', models.FloatField(blank=True, null=True)),
+                ('bmi_state', models.CharField(blank=True, max_length=64, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyhealthsummary',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='dailyhealthsummary_user_day'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:48
+
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# Frozen copies of BodyPhysique.compute_bmi and state_of_bmi when the
+# stored bmi was added, the model may change later
+
+# Lower borderlines of normal, over and obese in hundredths
+STATE_EDGES = (1850, 2500, 3000)
+STATES = ("Underweight", "Normal Weight", "Overweight", "Obesity")
+
+
+def compute_bmi(weight, height):
+    """
+        weight / (height / 100)**2 rounded to two places, in hundredths as
+        weight * 10**8 / height**2 with exact halves rounded down
+    """
+    weight_hundredths = int(weight.scaleb(2))
+    height_hundredths = int(height.scaleb(2))
+    if not height_hundredths:
+        return None
+
+    divisor = height_hundredths * height_hundredths
+    quotient, remainder = divmod(weight_hundredths * 10 ** 8, divisor)
+    if remainder * 2 > divisor:
+        quotient += 1
+    return Decimal(quotient).scaleb(-2)
+
+
+def state_of_bmi(bmi):
+    return STATES[bisect_right(STATE_EDGES, int(bmi.scaleb(2)))]
+
+
+def backfill_stored_bmi(apps, schema_editor):
+    """
+        Stores the bmi of the records saved before stored_bmi existed
+    """
+    BodyPhysique = apps.get_model('healthcare', 'BodyPhysique')
+    records = BodyPhysique.objects.using(schema_editor.connection.alias)
+
+    changed = []
+    rows = records.order_by('pk').values_list('pk', 'weight_in_kilograms', 'height_in_centimeters')
+    for pk, weight, height in rows.iterator(chunk_size=1000):
+        bmi = compute_bmi(weight, height)
+        if bmi is None:
+            continue
+        changed.append(BodyPhysique(pk=pk, stored_bmi=bmi, stored_bmi_state=state_of_bmi(bmi)))
+        if len(changed) >= 1000:
+            records.bulk_update(changed, ['stored_bmi', 'stored_bmi_state'])
+            changed = []
+    records.bulk_update(changed, ['stored_bmi', 'stored_bmi_state'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0006_dailyhealthsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bodyphysique',
+            name='stored_bmi',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='bodyphysique',
+            name='stored_bmi_state',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_stored_bmi, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('healthcare', '0007_bodyphysique_stored_bmi'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedHealthRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.PositiveIntegerField(unique=True)),
+                ('record_type', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'blood_pressure'), (1, 'body_physique')], null=True)),
+                ('record_date', models.DateTimeField(null=True)),
+                ('details', models.TextField(blank=True, max_length=255, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('created', models.DateTimeField()),
+                ('deactivated', models.DateTimeField()),
+                ('archived', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='healthrecord',
+            name='healthrecord_user_active_date',
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(condition=models.Q(is_active=True), fields=['user', 'record_date'], name='healthrecord_active_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(condition=models.Q(is_active=False), fields=['date_updated'], name='healthrecord_inactive_updated'),
+        ),
+        migrations.AddField(
+            model_name='archivedhealthrecord',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+# Frozen copies of build_key_words, BloodPressure.state and
+# HealthRecord.NO_DETAILS when the search index was added, the models may
+# change later
+
+NO_DETAILS = "No details available"
+
+# (state, systolic range, diastolic range, both must match), in the order of
+# BloodPressure.state. None leaves that side unbounded.
+BLOOD_PRESSURE_STATES = (
+    ("Normal Blood Pressure", (90, 119), (60, 79), True),
+    ("Elevated Hypertension", (120, 129), (60, 79), True),
+    ("Hypertension Crisis (Risky)", (181, None), (121, None), False),
+    ("Hypertension Stage II (Very High)", (140, 180), (90, 120), False),
+    ("Hypertension Stage I (High)", (130, 139), (80, 89), False),
+    ("Alarmingly Low", (None, 89), (None, 59), False),
+)
+
+
+def within(value, limits):
+    lower, upper = limits
+    return (lower is None or value >= lower) and (upper is None or value <= upper)
+
+
+def blood_pressure_state(systolic, diastolic):
+    for state, systolic_limits, diastolic_limits, both in BLOOD_PRESSURE_STATES:
+        matches = (within(systolic, systolic_limits), within(diastolic, diastolic_limits))
+        if all(matches) if both else any(matches):
+            return state
+    return None
+
+
+def build_key_words(record_date, state, details=None):
+    key_words = f"{timezone.localtime(record_date).strftime('%B %b %d, %Y %I %M %I:%M %p')} {state}"
+    if details:
+        key_words += f" {details}"
+    return key_words
+
+
+def backfill_key_words(apps, schema_editor):
+    """
+        Rebuilds the key words of the records saved before they held the
+        abbreviated month and the details. The full text indexes follow the
+        column: the GIN index on Postgres, the FTS5 triggers on SQLite.
+    """
+    HealthRecord = apps.get_model('healthcare', 'HealthRecord')
+    records = HealthRecord.objects.using(schema_editor.connection.alias)
+
+    rows = (records.filter(record_date__isnull=False).order_by('pk')
+            .values_list('pk', 'record_date', 'details', 'bloodpressure__systolic_pressure',
+                         'bloodpressure__diastolic_pressure', 'bodyphysique__stored_bmi_state'))
+    changed = []
+    for pk, record_date, details, systolic, diastolic, bmi_state in rows.iterator(chunk_size=1000):
+        if systolic is not None:
+            state = blood_pressure_state(systolic, diastolic)
+        elif bmi_state is not None:
+            state = bmi_state
+        else:
+            state = "n/a"
+
+        details = details if details != NO_DETAILS else None
+        changed.append(HealthRecord(pk=pk, key_words=build_key_words(record_date, state, details)))
+        if len(changed) >= 1000:
+            records.bulk_update(changed, ['key_words'])
+            changed = []
+    records.bulk_update(changed, ['key_words'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0008_archive_inactive_records'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_key_words, migrations.RunPython.noop),
+    ]
@@ -1,69 +1,62 @@
-from datetime import datetime
-from django.utils import timezone
+from core.date_ranges import DateRangeResolver, subtract_month
+from core.shortcuts import get_object_or_403
 
-from pastagcore.shortcuts import get_object_or_403
+from users.models import Profile
 
+from .cache import get_latest_record
 from .models import BloodPressure, BodyPhysique, HealthRecord
 
 class OwnerRecordRequiredMixin(object):
     """
         Get if the one accessing the record is the owner
         If not board member, throw bad request.
+
+        The record is loaded once, as its blood pressure or body physique,
+        and handed to the view through get_object()
     """
     # error_board = "boards/error_member.html"
+    record = None
+
+    def get_record_queryset(self):
+        # Joins the child tables so the concrete record comes with the same query
+        return HealthRecord.active_objects.with_children()
+
     def dispatch(self, request, *args, **kwargs):
         id = self.kwargs.get('id')
         # Permission Denied if it does not exist
-        get_object_or_403(HealthRecord.active_objects, pk=id, user=self.request.user)
+        record = get_object_or_403(self.get_record_queryset(), pk=id, user=self.request.user)
+        self.record = record.concrete_record or record
 
         return super().dispatch(request, *args, **kwargs)
 
+    def get_object(self, queryset=None):
+        """
+            The record checked on dispatch, no extra query
+        """
+        return self.record
+
 class ApiDateRangeMixin(object):
     """
         Common code for extracting from date and until date on
         graph api
     """
+    date_range_resolver = DateRangeResolver()
 
     def extract_from_date_and_until_date(self, *args, **kwargs):
-        today_date = timezone.localtime()
-        last_month = self.get_last_month(today_date)
-        from_date = self.request.GET.get("from_date", None)
-        until_date = self.request.GET.get("until_date", None)
-
-        if from_date:
-            from_date = timezone.localtime(timezone.make_aware(datetime.strptime(from_date, "%Y-%m-%d")))
-        else:
-            from_date = last_month
-
-        if until_date:
-            until_date = timezone.localtime(timezone.make_aware(datetime.strptime(until_date, "%Y-%m-%d")))
-            until_date = until_date.replace(hour=23, minute=59, second=59)
-        else:
-            until_date = today_date
-
-        return from_date, until_date
+        """
+            Raises InvalidDateRange on dates or ranges that cannot be parsed
+        """
+        return self.date_range_resolver.resolve(
+            from_date=self.request.GET.get("from_date", None),
+            until_date=self.request.GET.get("until_date", None),
+            preset=self.request.GET.get("range", None),
+        )
 
     def get_last_month(self, today_date):
         """
             Gets last month without losing the timezone
         """
-        last_full_month = today_date
-        last_month = today_date.month - 1
-
-        if last_month == 0:
-            last_month = 1
-
-        invalid = True
-        to_substract = 0
-        while invalid and to_substract < 33:
-            try:
-                last_full_month = today_date.replace(month=last_month, day=today_date.day - to_substract)
-                invalid = False
-            except ValueError as e:
-                print(e)
-                to_substract += 1
-
-        return last_full_month
+        return subtract_month(today_date)
 
 class BloodPressureMixin(object):
     """
@@ -81,7 +74,7 @@ class BloodPressureMixin(object):
             Gets a user's latest blood pressure
         """
 
-        latest = BloodPressure.active_objects.filter(user=user).order_by('record_date').last()
+        latest = get_latest_record(BloodPressure, user)
 
         if latest:
             return latest
@@ -104,7 +97,7 @@ class BodyPhysiqueMixin(object):
             Gets a user's latest body_physique
         """
 
-        latest = BodyPhysique.active_objects.filter(user=user).order_by('record_date').last()
+        latest = get_latest_record(BodyPhysique, user)
 
         if latest:
             return latest
@@ -113,9 +106,6 @@ class BodyPhysiqueMixin(object):
 
     def get_my_latest_height(self, user):
         """
-            Gets the user latest height
+            Gets the user latest height, carried forward on the user's profile
         """
-        body_physique = self.get_user_latest_body_physique(self.request.user)
-        if body_physique:
-            return body_physique.height_in_centimeters
-        return None
\ No newline at end of file
+        return Profile.objects.current_height(user)
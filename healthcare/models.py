@@ -1,11 +1,159 @@
-from django.db import models
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections, models, router, transaction
+from django.db.models import Case, CharField, F, Q, Value, When
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 
-from core.models import CommonInfo
+from core.models import ActiveManager, ActiveQuerySet, CommonInfo
+from users.models import Profile
 
+from .cache import forget_latest_records, record_deleted, record_saved
+from .search import build_key_words, search_records
+from .signals import records_changed
+
+from array import array
+from bisect import bisect_right
 from decimal import Decimal
+from functools import lru_cache
+from itertools import islice
+
+# array.array typecodes that cannot hold negative values
+UNSIGNED_TYPECODES = frozenset('BHILQ')
+
+
+class HealthRecordQuerySet(ActiveQuerySet):
+    """
+        Query set for health records
+    """
+
+    def deactivate(self):
+        return self._change_activity(super().deactivate, is_active=True)
+
+    def restore(self):
+        return self._change_activity(super().restore, is_active=False)
+
+    def _change_activity(self, update, is_active):
+        """
+            Runs the bulk update then does what save() would have done: drops
+            the cached latest records and refreshes the touched days
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            user_days = {}
+            record_types = set()
+            rows = self.filter(is_active=is_active).values_list('user', 'record_date', 'record_type')
+            for user_id, record_date, record_type in rows:
+                user_days.setdefault(user_id, set()).add(timezone.localtime(record_date).date())
+                record_types.add(record_type)
+
+            updated = update()
+
+            if user_days:
+                record_type_names = {name for name, value in HealthRecord.record_types.items()
+                                     if value in record_types or None in record_types}
+                for record_type_name in record_type_names:
+                    forget_latest_records(list(user_days), record_type_name, using=self.db)
+                    HealthRecord.child_model(HealthRecord.record_types[record_type_name]).refresh_carried(
+                        list(user_days), using=self.db)
+                sender = self.model
+                if len(record_types) == 1:
+                    sender = HealthRecord.child_model(*record_types) or sender
+                records_changed.send(sender=sender, user_days=user_days, using=self.db)
+        return updated
+
+    def with_children(self):
+        """
+            Joins the child tables so the concrete record of every health
+            record is resolved without extra queries
+        """
+        return self.select_related(*HealthRecord.child_related_names)
+
+    def search(self, text):
+        """
+            Searches by date parts and key words, e.g. "march 2021 elevated"
+        """
+        return search_records(self, text)
+
+    def of_type(self, record_type_name):
+        """
+            Filters by the stored record type, no join on the child tables
+        """
+        return self.filter(record_type=HealthRecord.record_types[record_type_name])
+
+    def blood_pressures(self):
+        return self.of_type("blood_pressure")
+
+    def body_physiques(self):
+        return self.of_type("body_physique")
+
+    def bulk_ingest(self, records, batch_size=1000):
+        """
+            Inserts many child records (blood pressure or body physique) in
+            one transaction without calling save() per record.
+            records may be model instances or dicts of field values. Like
+            bulk_create(), no validation is done and the records must have
+            a user.
+        """
+        model = self.model
+        if not model.record_type_name:
+            raise ValueError("bulk_ingest() needs a child record model like BloodPressure or BodyPhysique.")
+
+        self._for_write = True
+        database = self.db
+        connection = connections[database]
+
+        parent_fields = [field for field in HealthRecord._meta.local_concrete_fields if not field.primary_key]
+        child_fields = model._meta.local_concrete_fields
+        returning_fields = HealthRecord._meta.db_returning_fields
+        child_batch_size = max(1, min(batch_size, connection.ops.bulk_batch_size(child_fields, [None] * batch_size)))
+        parent_batch_size = max(1, min(batch_size, connection.ops.bulk_batch_size(parent_fields, [None] * batch_size)))
+
+        now = timezone.localtime(timezone.now())
+        ingested = []
+        user_days = {}
+        records = iter(records)
+
+        with transaction.atomic(using=database, savepoint=False):
+            while True:
+                batch = [record if isinstance(record, model) else model(**record)
+                         for record in islice(records, batch_size)]
+                if not batch:
+                    break
+
+                for record, state in zip(batch, model.states_of(batch)):
+                    record.prepare_for_save(state=state, now=now)
+                    user_days.setdefault(record.user_id, set()).add(record.record_day)
+
+                # Parents first, the children need their primary keys
+                if connection.features.can_return_rows_from_bulk_insert:
+                    parent_batches = [batch[start:start + parent_batch_size]
+                                      for start in range(0, len(batch), parent_batch_size)]
+                else:
+                    parent_batches = [[record] for record in batch]
+
+                for parent_batch in parent_batches:
+                    rows = HealthRecord._base_manager._insert(
+                        parent_batch, fields=parent_fields, returning_fields=returning_fields, using=database)
+                    for record, row in zip(parent_batch, rows):
+                        setattr(record, HealthRecord._meta.pk.attname, row[0])
+                        setattr(record, model._meta.pk.attname, row[0])
+
+                for start in range(0, len(batch), child_batch_size):
+                    model._base_manager._insert(batch[start:start + child_batch_size], fields=child_fields,
+                                                using=database)
+
+                for record in batch:
+                    record._state.adding = False
+                    record._state.db = database
+                model.carry_forward(batch, using=database)
+                ingested.extend(batch)
+
+            forget_latest_records(list(user_days), model.record_type_name, using=database)
+            records_changed.send(sender=model, user_days=user_days, using=database)
+
+        return ingested
 
 
 class HealthRecord(CommonInfo):
@@ -18,29 +166,103 @@ class HealthRecord(CommonInfo):
         "body_physique": 1
     }
 
+    # The reverse relations to the child records
+    child_related_names = ('bloodpressure', 'bodyphysique')
+
+    # Overridden by the child records, key of record_types
+    record_type_name = None
+
+    NO_DETAILS = "No details available"
+
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     details = models.TextField(max_length=255, null=True, blank=True)
     record_date = models.DateTimeField(null=True)
     key_words = models.TextField(max_length=1024, null=True, blank=True)
+    # Denormalized type of the child record, filled on save
+    record_type = models.PositiveSmallIntegerField(
+        null=True, blank=True, editable=False, db_index=True,
+        choices=[(value, name) for name, value in record_types.items()])
+
+    objects = HealthRecordQuerySet.as_manager()
+    active_objects = ActiveManager.from_queryset(HealthRecordQuerySet)()
+
+    class Meta:
+        indexes = [
+            # Per user time ordered lookups and date range scans, deactivated rows stay out of it
+            models.Index(fields=['user', 'record_date'], condition=Q(is_active=True),
+                         name='healthrecord_active_user_date'),
+            # Finds the long deactivated records to archive
+            models.Index(fields=['date_updated'], condition=Q(is_active=False),
+                         name='healthrecord_inactive_updated'),
+            # Latest record of a type, only active records are ever read this way
+            models.Index(fields=['user', 'record_type', 'record_date'], condition=Q(is_active=True),
+                         name='healthrecord_user_type_date'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the day the record was on, in case it gets moved
+        instance._loaded_record_date = instance.__dict__.get('record_date')
+        return instance
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
 
+        self.prepare_for_save()
+
+        # The record, the profile and the daily summaries commit together, a
+        # failing rollup must not leave a saved record behind a 500
+        using = using or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super(HealthRecord, self).save(force_insert, force_update, using,
+                                           update_fields)
+
+            # Keep the latest record cache in sync
+            record_saved(self, using=self._state.db)
+            if self.record_type_name:
+                self.carry_forward([self], using=self._state.db)
+            elif self.child_model(self.record_type):
+                # Saved through the parent, e.g. deactivated, the child fields are not loaded
+                self.child_model(self.record_type).refresh_carried([self.user_id], using=self._state.db)
+
+            days = {self.record_day}
+            loaded_record_date = getattr(self, '_loaded_record_date', None)
+            if loaded_record_date:
+                days.add(timezone.localtime(loaded_record_date).date())
+            # Sent for the child model, the receivers only refresh what belongs to it
+            records_changed.send(sender=self.child_model(self.record_type) or self.__class__,
+                                 user_days={self.user_id: days}, using=self._state.db)
+        self._loaded_record_date = self.record_date
+
+    def prepare_for_save(self, state=None, now=None):
+        """
+            Fills the defaults and the key words, done on save() and in bulk
+            by bulk_ingest() which passes the precomputed state
+        """
         # This adds record date now when submitted empty
         if not self.record_date:
-            self.record_date = timezone.localtime(timezone.now())
+            self.record_date = now or timezone.localtime(timezone.now())
 
         if not self.details:
-            self.details = "No details available"
+            self.details = self.NO_DETAILS
 
-        # TODO: There must be a better way to search a date by string!
-        record_date_with_time_zone = timezone.localtime(self.record_date).strftime('%B %d, %Y %I %M %I:%M %p')
+        if self.record_type_name:
+            self.record_type = self.record_types.get(self.record_type_name)
 
-        self.key_words = ""
-        self.key_words += f'{record_date_with_time_zone} {self.state}'
+        # Dates are searched through the record_date indexes, see search.py
+        if state is None:
+            state = self.state
 
-        return super(HealthRecord, self).save(force_insert, force_update, using,
-                                              update_fields)
+        details = self.details if self.details != self.NO_DETAILS else None
+        self.key_words = build_key_words(self.record_date, state, details)
+
+    @property
+    def record_day(self):
+        """
+            The local date of the record
+        """
+        return timezone.localtime(self.record_date).date()
 
     @property
     def formatted_record_date(self):
@@ -58,33 +280,111 @@ class HealthRecord(CommonInfo):
         record_date_with_time_zone = timezone.localtime(self.record_date)
         return f"{record_date_with_time_zone.strftime('%I:%M %p')}"
 
+    @property
+    def concrete_record(self):
+        """
+            Returns the child record (blood pressure or body physique) or None.
+            Use with_children() on the query set to avoid a query per child table.
+        """
+        if self.record_type_name:
+            return self
+
+        for related_name in self.child_related_names:
+            try:
+                return getattr(self, related_name)
+            except ObjectDoesNotExist:
+                pass
+        return None
+
     @property
     def state(self):
         # If the parent state is called, try to get type or return n/a
         # We need to define the type of record first
+        record = self.concrete_record
 
-        if hasattr(self, 'bloodpressure'):
-            return self.bloodpressure.state
-        elif hasattr(self, 'bodyphysique'):
-            return self.bodyphysique.state
+        if record:
+            return record.state
         return "n/a"
 
+    @classmethod
+    def states_of(cls, records):
+        """
+            The states of many records, child records may do it in bulk
+        """
+        return [record.state for record in records]
+
+    @classmethod
+    def carry_forward(cls, records, using=None):
+        """
+            Called with the records just written, child records copy what
+            outlives the record itself to the user's profile
+        """
+
+    @classmethod
+    def refresh_carried(cls, user_ids, using=None):
+        """
+            Called when records of the users were deactivated, restored or
+            deleted, child records recompute what they carried forward
+        """
+
+    @classmethod
+    def child_model(cls, record_type):
+        """
+            The child record model of a stored record type, None if unknown
+        """
+        for model in HealthRecord.__subclasses__():
+            if HealthRecord.record_types.get(model.record_type_name) == record_type:
+                return model
+        return None
+
     def get_record_type(self):
         # If the parent state is called, try to get type or return n/a
         # We need to define the type of record first
+        if self.record_type is not None:
+            return self.record_type
 
-        if hasattr(self, 'bloodpressure'):
-            return self.record_types.get("blood_pressure")
-        elif hasattr(self, 'bodyphysique'):
-            return self.record_types.get("body_physique")
+        record = self.concrete_record
+
+        if record:
+            return self.record_types.get(record.record_type_name)
         return "n/a"
 
 
+class BloodPressureQuerySet(HealthRecordQuerySet):
+    """
+        Query set for blood pressure records
+    """
+
+    def classify(self):
+        """
+            Returns the state of every reading on this query set in one pass,
+            following the ordering of the query set
+        """
+        systolic = array('i')
+        diastolic = array('i')
+        for systolic_pressure, diastolic_pressure in self.values_list('systolic_pressure', 'diastolic_pressure'):
+            systolic.append(systolic_pressure)
+            diastolic.append(diastolic_pressure)
+        return self.model.classify_many(systolic, diastolic)
+
+    def with_state(self):
+        """
+            Annotates the state of every reading as record_state so it can be
+            filtered, counted and ordered by the database
+        """
+        return self.annotate(record_state=self.model.state_expression())
+
+
 class BloodPressure(HealthRecord):
     """
     This is the model for a bloodpressure record
     """
 
+    record_type_name = "blood_pressure"
+
+    objects = BloodPressureQuerySet.as_manager()
+    active_objects = ActiveManager.from_queryset(BloodPressureQuerySet)()
+
     states = {
         "normal": "Normal Blood Pressure",
         "elevated": "Elevated Hypertension",
@@ -231,11 +531,169 @@ class BloodPressure(HealthRecord):
             # Range is 90 down and 60 down
             return self.states.get('low')
 
+    @classmethod
+    def state_expression(cls):
+        """
+            The state property as a database expression.
+            Keep the order of the conditions the same as the state property.
+        """
+        def within(pressure, band):
+            field = f"{pressure.lower()}_pressure"
+            limits = cls.BORDERLINE[band][pressure]
+            return Q(**{f"{field}__gte": limits["LOWER"], f"{field}__lte": limits["UPPER"]})
+
+        def at_least(pressure, band):
+            return Q(**{f"{pressure.lower()}_pressure__gte": cls.BORDERLINE[band][pressure]["LOWER"]})
+
+        def at_most(pressure, band):
+            return Q(**{f"{pressure.lower()}_pressure__lte": cls.BORDERLINE[band][pressure]["UPPER"]})
+
+        return Case(
+            When(within("SYSTOLIC", "NORMAL") & within("DIASTOLIC", "NORMAL"),
+                 then=Value(cls.states.get('normal'))),
+            When(within("SYSTOLIC", "ELEVATED") & within("DIASTOLIC", "ELEVATED"),
+                 then=Value(cls.states.get('elevated'))),
+            When(at_least("SYSTOLIC", "RISKY") | at_least("DIASTOLIC", "RISKY"),
+                 then=Value(cls.states.get('risky'))),
+            When(within("SYSTOLIC", "VERY_HIGH") | within("DIASTOLIC", "VERY_HIGH"),
+                 then=Value(cls.states.get('very_high'))),
+            When(within("SYSTOLIC", "HIGH") | within("DIASTOLIC", "HIGH"),
+                 then=Value(cls.states.get('high'))),
+            When(at_most("SYSTOLIC", "LOW") | at_most("DIASTOLIC", "LOW"),
+                 then=Value(cls.states.get('low'))),
+            output_field=CharField()
+        )
+
+    # Values inside the validated range are classified by a plain list lookup
+    CLASSIFY_LOOKUP_SIZE = 1000
+
+    _state_table = None
+
+    @classmethod
+    def _get_state_table(cls):
+        """
+            Flattens BORDERLINE into sorted band boundaries for each pressure
+            and a table with the state of every (systolic band, diastolic band)
+            pair. The table is filled using the state property itself so both
+            can never disagree.
+        """
+        if cls._state_table is None:
+            boundaries = {}
+            for pressure in ("SYSTOLIC", "DIASTOLIC"):
+                edges = set()
+                for band in cls.BORDERLINE.values():
+                    if "LOWER" in band[pressure]:
+                        edges.add(band[pressure]["LOWER"])
+                    if "UPPER" in band[pressure]:
+                        edges.add(band[pressure]["UPPER"] + 1)
+                boundaries[pressure] = sorted(edges)
+
+            systolic_edges = boundaries["SYSTOLIC"]
+            diastolic_edges = boundaries["DIASTOLIC"]
+            stride = len(diastolic_edges) + 1
+
+            # The first value of each band represents the whole band
+            def representatives(edges):
+                return [edges[0] - 1] + edges
+
+            states = []
+            for systolic_pressure in representatives(systolic_edges):
+                for diastolic_pressure in representatives(diastolic_edges):
+                    reading = cls(systolic_pressure=systolic_pressure, diastolic_pressure=diastolic_pressure)
+                    states.append(reading.state)
+
+            # Precomputed band offsets for the validated range
+            systolic_lookup = [bisect_right(systolic_edges, value) * stride
+                               for value in range(cls.CLASSIFY_LOOKUP_SIZE)]
+            diastolic_lookup = [bisect_right(diastolic_edges, value)
+                                for value in range(cls.CLASSIFY_LOOKUP_SIZE)]
+
+            cls._state_table = (systolic_edges, diastolic_edges, stride, states,
+                                systolic_lookup, diastolic_lookup)
+        return cls._state_table
+
+    @classmethod
+    def states_of(cls, records):
+        return cls.classify_many([record.systolic_pressure for record in records],
+                                 [record.diastolic_pressure for record in records])
+
+    @staticmethod
+    def _without_negatives(pressures):
+        # Negative indexes would wrap around the lookups, unsigned columns
+        # (e.g. array('H')) cannot hold any
+        if getattr(pressures, 'typecode', 'i') in UNSIGNED_TYPECODES:
+            return True
+        return not len(pressures) or min(pressures) >= 0
+
+    @classmethod
+    def classify_many(cls, systolic_pressures, diastolic_pressures):
+        """
+            Classifies many readings at once. Accepts lists, array.array or
+            NumPy columns of the same length and returns a list of states
+            matching the state property of each reading.
+        """
+        if len(systolic_pressures) != len(diastolic_pressures):
+            raise ValueError("Systolic and diastolic pressures must have the same length.")
+
+        (systolic_edges, diastolic_edges, stride, states,
+            systolic_lookup, diastolic_lookup) = cls._get_state_table()
+
+        if hasattr(systolic_pressures, 'dtype') or hasattr(diastolic_pressures, 'dtype'):
+            # NumPy columns, classify the whole column with searchsorted
+            import numpy
+
+            bands = (numpy.searchsorted(systolic_edges, systolic_pressures, side='right') * stride +
+                     numpy.searchsorted(diastolic_edges, diastolic_pressures, side='right'))
+            return numpy.array(states, dtype=object)[bands].tolist()
+
+        if cls._without_negatives(systolic_pressures) and cls._without_negatives(diastolic_pressures):
+            # Values past CLASSIFY_LOOKUP_SIZE raise IndexError, checking for them
+            # up front would cost more than the classification itself
+            try:
+                return [states[systolic_lookup[systolic] + diastolic_lookup[diastolic]]
+                        for systolic, diastolic in zip(systolic_pressures, diastolic_pressures)]
+            except IndexError:
+                pass
+
+        return [states[bisect_right(systolic_edges, systolic) * stride + bisect_right(diastolic_edges, diastolic)]
+                for systolic, diastolic in zip(systolic_pressures, diastolic_pressures)]
+
+
+class BodyPhysiqueQuerySet(HealthRecordQuerySet):
+    """
+        Query set for body physique records
+    """
+
+    def with_state(self):
+        """
+            Annotates the bmi as record_bmi and the bmi state as record_state
+            so both can be filtered, counted and ordered by the database.
+            Both are read from the stored columns.
+        """
+        return self.annotate(record_bmi=F('stored_bmi'), record_state=F('stored_bmi_state'))
+
+    def record_weight(self, user, weight, height=None, **fields):
+        """
+            Records a weight check in, the height is carried forward from
+            the user's profile when not given so the history is not read
+        """
+        if height is None:
+            height = Profile.objects.using(self.db).current_height(user)
+        if height is None:
+            raise ValueError("No height recorded yet, a height is needed to record a weight.")
+        return self.create(user=user, weight_in_kilograms=weight, height_in_centimeters=height, **fields)
+
 
 class BodyPhysique(HealthRecord):
     """
     This is the model for a the user's body physique record
     """
+
+    record_type_name = "body_physique"
+
+    objects = BodyPhysiqueQuerySet.as_manager()
+    active_objects = ActiveManager.from_queryset(BodyPhysiqueQuerySet)()
+
     states = {
         "under": "Underweight",
         "normal": "Normal Weight",
@@ -249,6 +707,12 @@ class BodyPhysique(HealthRecord):
     # Height
     height_in_centimeters = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="Height (cm)",
                                                 validators=[MinValueValidator(1), MaxValueValidator(999)])
+    # The bmi and bmi_state properties, stored on save so they can be filtered and sorted
+    stored_bmi = models.DecimalField(max_digits=9, decimal_places=2, null=True, blank=True, editable=False,
+                                     db_index=True)
+    stored_bmi_state = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    _bmi_cache = None
 
     # Borderline constants
     BORDERLINE = {
@@ -268,6 +732,10 @@ class BodyPhysique(HealthRecord):
         }
     }
 
+    # Lower borderlines of normal, over and obese in hundredths
+    STATE_EDGES = (round(BORDERLINE["NORMAL"]["LOWER"] * 100), round(BORDERLINE["OVER"]["LOWER"] * 100),
+                   round(BORDERLINE["OBESE"]["LOWER"] * 100))
+
     def __str__(self):
         return f"{self.user}"
 
@@ -296,8 +764,13 @@ class BodyPhysique(HealthRecord):
             Calculates bmi for interpratation
             Based on:
             https://www.cdc.gov/healthyweight/assessing/bmi/childrens_bmi/childrens_bmi_formula.html
+
+            Computed once per weight and height, changing either recomputes it.
         """
-        return round(self.weight_in_kilograms / (self.height_in_meters**2), 2)
+        key = (self.weight_in_kilograms, self.height_in_centimeters)
+        if self._bmi_cache is None or self._bmi_cache[0] != key:
+            self._bmi_cache = (key, self.compute_bmi(*key))
+        return self._bmi_cache[1]
 
     @property
     def height_in_meters(self):
@@ -322,22 +795,137 @@ class BodyPhysique(HealthRecord):
             Overweight = 25–29.99
             Obesity = BMI of 30 or greater.
         """
-        if self.bmi <= self.BORDERLINE["UNDER"]["UPPER"]:
-            return self.states.get('under')
-        elif self.bmi >= self.BORDERLINE["NORMAL"]["LOWER"] and self.bmi <= self.BORDERLINE["NORMAL"]["UPPER"]:
-            return self.states.get('normal')
-        elif self.bmi >= self.BORDERLINE["OVER"]["LOWER"] and self.bmi <= self.BORDERLINE["OVER"]["UPPER"]:
-            return self.states.get('over')
-        elif self.bmi >= self.BORDERLINE["OBESE"]["LOWER"]:
-            return self.states.get('obese')
-
-        def is_bmi_normal(self):
-            """
-                Checks if the bmi is normal
-            """
-            if self.bmi >= self.BORDERLINE["NORMAL"]["LOWER"] and self.bmi <= self.BORDERLINE["NORMAL"]["UPPER"]:
-                return True
-            return False
+        return self.state_of_bmi(self.bmi)
+
+    def is_bmi_normal(self):
+        """
+            Checks if the bmi is normal
+        """
+        return self.bmi_state == self.states.get('normal')
+
+    @staticmethod
+    def _hundredths(value):
+        """
+            The value in hundredths as an int, None if it has more decimals
+        """
+        if isinstance(value, int):
+            return value * 100
+        if isinstance(value, Decimal) and value.is_finite():
+            scaled = value.scaleb(2)
+            if scaled == scaled.to_integral_value():
+                return int(scaled)
+        return None
+
+    @staticmethod
+    def bmi_hundredths(weight, height):
+        """
+            The bmi in hundredths from the weight (kg) and height (cm) in
+            hundredths, weight / (height / 100)**2 becomes
+            weight * 10**8 / height**2.
+
+            Exact halves round down like the Decimal formula: Decimal(0.01)
+            is a hair above 0.01 so its halves always end a hair below.
+        """
+        divisor = height * height
+        quotient, remainder = divmod(weight * 10 ** 8, divisor)
+        if remainder * 2 > divisor:
+            quotient += 1
+        return quotient
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def compute_bmi(cls, weight, height):
+        """
+            The bmi of a weight and height as a two places Decimal.
+            Values with at most two decimals take the integer path.
+        """
+        weight_hundredths = cls._hundredths(weight)
+        height_hundredths = cls._hundredths(height)
+        if not height_hundredths or weight_hundredths is None:
+            return round(weight / ((height * Decimal(0.01))**2), 2)
+        return Decimal(cls.bmi_hundredths(weight_hundredths, height_hundredths)).scaleb(-2)
+
+    @classmethod
+    def bmi_many(cls, weights, heights):
+        """
+            The bmi of many weight and height pairs, same values as the bmi property
+        """
+        if len(weights) != len(heights):
+            raise ValueError("Weights and heights must have the same length.")
+        return [cls.compute_bmi(weight, height) for weight, height in zip(weights, heights)]
+
+    @classmethod
+    def state_of_bmi(cls, bmi):
+        """
+            The bmi state of a two places bmi. Compared in hundredths so the
+            upper borderlines (18.49, 24.99, 29.99) are part of their state.
+        """
+        band = bisect_right(cls.STATE_EDGES, int(bmi.scaleb(2)))
+        return cls.states.get(("under", "normal", "over", "obese")[band])
+
+    @classmethod
+    def states_of(cls, records):
+        return [cls.state_of_bmi(bmi) for bmi in cls.bmi_many(
+            [record.weight_in_kilograms for record in records],
+            [record.height_in_centimeters for record in records])]
+
+    @classmethod
+    def carry_forward(cls, records, using=None):
+        # Only the newest record of each user matters
+        latest = {}
+        deactivated = set()
+        for record in records:
+            if not record.is_active:
+                deactivated.add(record.user_id)
+            elif record.user_id not in latest or record.record_date >= latest[record.user_id].record_date:
+                latest[record.user_id] = record
+
+        for user_id, record in latest.items():
+            if user_id not in deactivated:
+                Profile.objects.using(using).carry_height(user_id, record.height_in_centimeters, record.record_date)
+        # The deactivated record may be the one the height came from
+        cls.refresh_carried(deactivated, using=using)
+
+    @classmethod
+    def refresh_carried(cls, user_ids, using=None):
+        # The height of the latest remaining active body physique, or none
+        for user_id in user_ids:
+            latest = (cls.active_objects.using(using).filter(user_id=user_id).order_by('-record_date')
+                      .values_list('height_in_centimeters', 'record_date').first())
+            Profile.objects.using(using).set_height(user_id, *(latest or (None, None)))
+
+    def prepare_for_save(self, state=None, now=None):
+        self.stored_bmi = self.bmi
+        self.stored_bmi_state = self.bmi_state if state is None else state
+        super().prepare_for_save(state=self.stored_bmi_state, now=now)
+
+    @classmethod
+    def recompute_stored_bmi(cls, records, batch_size=1000):
+        """
+            Recomputes the stored bmi and bmi state of the records in
+            batches, for rows written around save(). Returns how many
+            rows changed.
+        """
+        rows = records.order_by('pk').values_list('pk', 'weight_in_kilograms', 'height_in_centimeters',
+                                                  'stored_bmi', 'stored_bmi_state')
+        changed = []
+        updated = 0
+
+        for pk, weight, height, stored_bmi, stored_bmi_state in rows.iterator(chunk_size=batch_size):
+            bmi = cls.compute_bmi(weight, height)
+            state = cls.state_of_bmi(bmi)
+            if bmi != stored_bmi or state != stored_bmi_state:
+                changed.append(records.model(pk=pk, stored_bmi=bmi, stored_bmi_state=state))
+
+            if len(changed) >= batch_size:
+                records.model._base_manager.using(records.db).bulk_update(changed, ['stored_bmi', 'stored_bmi_state'])
+                updated += len(changed)
+                changed = []
+
+        if changed:
+            records.model._base_manager.using(records.db).bulk_update(changed, ['stored_bmi', 'stored_bmi_state'])
+            updated += len(changed)
+        return updated
 
     def calculate_penalty(self):
         """
@@ -355,3 +943,97 @@ class BodyPhysique(HealthRecord):
                 return math.floor(30 - self.bmi)
 
         return 0
+
+
+@receiver(post_delete, sender=HealthRecord)
+@receiver(post_delete, sender=BloodPressure)
+@receiver(post_delete, sender=BodyPhysique)
+def health_record_deleted(sender, instance, using, **kwargs):
+    """
+        Hard deletes (admin, QuerySet.delete(), a deleted user) skip save(),
+        keep the latest record cache, the record version and what the
+        record carried forward in sync here. Deactivated records already
+        left all of them, e.g. the ones archive_inactive_records deletes.
+    """
+    if not instance.is_active:
+        return
+    record_deleted(instance, using=using)
+    if sender.record_type_name:
+        # Sent for the child and the parent row, the child handles it
+        sender.refresh_carried([instance.user_id], using=using)
+
+
+class DailyHealthSummary(CommonInfo):
+    """
+        One row per user per day with the aggregates of that day's readings.
+        Derived from the health records and kept up to date by rollups.py
+    """
+
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    day = models.DateField()
+
+    blood_pressure_count = models.PositiveIntegerField(default=0)
+    systolic_min = models.IntegerField(null=True, blank=True)
+    systolic_max = models.IntegerField(null=True, blank=True)
+    systolic_mean = models.FloatField(null=True, blank=True)
+    diastolic_min = models.IntegerField(null=True, blank=True)
+    diastolic_max = models.IntegerField(null=True, blank=True)
+    diastolic_mean = models.FloatField(null=True, blank=True)
+    # The most frequent state of the day
+    blood_pressure_state = models.CharField(max_length=64, null=True, blank=True)
+
+    body_physique_count = models.PositiveIntegerField(default=0)
+    weight_min = models.FloatField(null=True, blank=True)
+    weight_max = models.FloatField(null=True, blank=True)
+    weight_mean = models.FloatField(null=True, blank=True)
+    bmi_min = models.FloatField(null=True, blank=True)
+    bmi_max = models.FloatField(null=True, blank=True)
+    bmi_mean = models.FloatField(null=True, blank=True)
+    # The most frequent state of the day
+    bmi_state = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='dailyhealthsummary_user_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.day}"
+
+
+class ArchivedHealthRecord(models.Model):
+    """
+        Cold storage of health records that stayed deactivated for long,
+        moved here by the archive_inactive_records command.
+        The fields of the child record are kept in data.
+    """
+
+    record_id = models.PositiveIntegerField(unique=True)
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    record_type = models.PositiveSmallIntegerField(null=True, blank=True,
+                                                   choices=[(value, name) for name, value in
+                                                            HealthRecord.record_types.items()])
+    record_date = models.DateTimeField(null=True)
+    details = models.TextField(max_length=255, null=True, blank=True)
+    data = models.JSONField(default=dict)
+    created = models.DateTimeField()
+    deactivated = models.DateTimeField()
+    archived = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} {self.record_id}"
+
+    @classmethod
+    def from_record(cls, record):
+        """
+            The archive row of a health record loaded with_children()
+        """
+        concrete_record = record.concrete_record
+        data = {}
+        if concrete_record is not None:
+            data = {field.attname: field.value_to_string(concrete_record)
+                    for field in concrete_record._meta.local_concrete_fields if not field.remote_field}
+
+        return cls(record_id=record.pk, user_id=record.user_id, record_type=record.record_type,
+                   record_date=record.record_date, details=record.details, data=data,
+                   created=record.created, deactivated=record.date_updated)
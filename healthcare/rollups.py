@@ -0,0 +1,191 @@
+import operator
+from datetime import timedelta
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .aggregations import BLOOD_PRESSURE_METRICS, BODY_PHYSIQUE_METRICS, local_day_start
+from .models import BloodPressure, BodyPhysique, DailyHealthSummary, HealthRecord
+from .signals import records_changed
+
+# Days refreshed per query, keeps the IN lists and OR chains of ranges small
+DAYS_PER_QUERY = 500
+
+
+def _summarized_models():
+    # model, prefix of the count field, metrics, field of the dominant state
+    return (
+        (BloodPressure, 'blood_pressure', BLOOD_PRESSURE_METRICS, 'blood_pressure_state'),
+        (BodyPhysique, 'body_physique', BODY_PHYSIQUE_METRICS, 'bmi_state'),
+    )
+
+
+def _summary_fields(prefix, metrics, state_field):
+    return [f'{prefix}_count', state_field,
+            *(f'{name}_{aggregate}' for name in metrics for aggregate in ('min', 'max', 'mean'))]
+
+
+def _daily_values(records, prefix, metrics, state_field):
+    """
+        The summary field values per (user, day) of the records. One query
+        grouped by state, the states of a day are merged here and the most
+        frequent one is the dominant state.
+    """
+    aggregates = {'count': Count('pk')}
+    for name, expression in metrics.items():
+        aggregates[f'{name}_count'] = Count(expression)
+        aggregates[f'{name}_min'] = Min(expression)
+        aggregates[f'{name}_max'] = Max(expression)
+        aggregates[f'{name}_sum'] = Sum(expression)
+
+    rows = (records.order_by()
+            .with_state()
+            .annotate(day=TruncDate('record_date'))
+            .values('user', 'day', 'record_state')
+            .annotate(**aggregates))
+
+    states_of_days = {}
+    for row in rows:
+        states_of_days.setdefault((row['user'], row['day']), []).append(row)
+
+    values = {}
+    for key, states in states_of_days.items():
+        day = values[key] = {
+            f'{prefix}_count': sum(state['count'] for state in states),
+            state_field: max((state['count'], state['record_state'] or "") for state in states)[1],
+        }
+        for name in metrics:
+            counted = [state for state in states if state[f'{name}_count']]
+            day[f'{name}_min'] = _float(min((state[f'{name}_min'] for state in counted), default=None))
+            day[f'{name}_max'] = _float(max((state[f'{name}_max'] for state in counted), default=None))
+            day[f'{name}_mean'] = (_float(sum(state[f'{name}_sum'] for state in counted))
+                                   / sum(state[f'{name}_count'] for state in counted)) if counted else None
+    return values
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _day_ranges(days):
+    """
+        The local dates as Q objects of record_date ranges, consecutive days
+        are merged into one range
+    """
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [Q(record_date__gte=local_day_start(start), record_date__lt=local_day_start(end))
+            for start, end in ranges]
+
+
+def _lock_summaries(summaries, keys, using):
+    """
+        Locks the summary rows of the query set, creating the missing ones of
+        the (user, day) keys first. Concurrent writers of a day take turns on
+        its row and the second one reads the records the first one committed.
+    """
+    def locked_rows():
+        return {(summary.user_id, summary.day): summary
+                for summary in summaries.select_for_update().order_by('user', 'day')}
+
+    locked = locked_rows()
+    missing = keys - set(locked)
+    if missing:
+        DailyHealthSummary.objects.using(using).bulk_create(
+            [DailyHealthSummary(user_id=user_id, day=day) for user_id, day in sorted(missing)],
+            batch_size=1000, ignore_conflicts=True)
+        locked = locked_rows()
+    return locked
+
+
+def _refresh(summaries, keys, records, models, using):
+    """
+        Recomputes the columns of the models in the locked summary rows from
+        the records, rows without any record left are deleted
+    """
+    locked = _lock_summaries(summaries, keys, using)
+    if not locked:
+        return
+
+    fields = ['date_updated']
+    now = timezone.now()
+    for model, prefix, metrics, state_field in models:
+        model_fields = _summary_fields(prefix, metrics, state_field)
+        fields.extend(model_fields)
+        empty = dict.fromkeys(model_fields)
+        empty[f'{prefix}_count'] = 0
+
+        values = _daily_values(records(model), prefix, metrics, state_field)
+        # Days of records written after the rows were locked are refreshed by their writer
+        for key, summary in locked.items():
+            for field, value in values.get(key, empty).items():
+                setattr(summary, field, value)
+            summary.date_updated = now
+
+    manager = DailyHealthSummary.objects.using(using)
+    kept, emptied = [], []
+    for summary in locked.values():
+        if summary.blood_pressure_count or summary.body_physique_count:
+            kept.append(summary)
+        else:
+            emptied.append(summary.pk)
+    if kept:
+        manager.bulk_update(kept, fields, batch_size=1000)
+    if emptied:
+        manager.filter(pk__in=emptied).delete()
+
+
+def refresh_daily_summaries(user_days, models=None, using=None):
+    """
+        Recomputes the columns of the record models (both by default) in the
+        summaries of exactly the touched days, user_days maps user ids to sets
+        of local dates. Only the rows of those days are locked and written.
+    """
+    models = [entry for entry in _summarized_models() if models is None or entry[0] in models]
+
+    with transaction.atomic(using=using, savepoint=False):
+        for user_id in sorted(user_days):
+            days = sorted(user_days[user_id])
+            for start in range(0, len(days), DAYS_PER_QUERY):
+                chunk = days[start:start + DAYS_PER_QUERY]
+                within = reduce(operator.or_, _day_ranges(chunk))
+                _refresh(
+                    DailyHealthSummary.objects.using(using).filter(user_id=user_id, day__in=chunk),
+                    {(user_id, day) for day in chunk},
+                    lambda model: model.active_objects.using(using).filter(within, user_id=user_id),
+                    models, using,
+                )
+
+
+def rebuild_daily_summaries(user_ids, using=None):
+    """
+        Recomputes every summary of the users from the health records
+    """
+    with transaction.atomic(using=using, savepoint=False):
+        keys = set(HealthRecord.active_objects.using(using).filter(user__in=user_ids).order_by()
+                   .annotate(day=TruncDate('record_date')).values_list('user', 'day').distinct())
+        _refresh(
+            DailyHealthSummary.objects.using(using).filter(user__in=user_ids),
+            keys,
+            lambda model: model.active_objects.using(using).filter(user__in=user_ids),
+            _summarized_models(), using,
+        )
+
+
+@receiver(records_changed)
+def refresh_touched_days(sender, user_days, using=None, **kwargs):
+    """
+        Keeps the summaries of the touched days in sync, in the same
+        transaction as the write (see HealthRecord.save). Writes of one
+        record model only refresh its columns.
+    """
+    models = [sender] if sender.record_type_name else None
+    refresh_daily_summaries(user_days, models=models, using=using)
@@ -0,0 +1,197 @@
+import calendar
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+SQLITE_SEARCH_TABLE = "healthcare_healthrecord_search"
+POSTGRES_SEARCH_INDEX = "healthrecord_key_words_search"
+
+# english month names and abbreviations to month numbers
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+
+TOKEN = re.compile(r"[\w:]+")
+
+ParsedSearch = namedtuple('ParsedSearch', ['year', 'month', 'day', 'terms'])
+
+# Whether the FTS5 table exists, per SQLite database
+_sqlite_search_tables = {}
+
+
+def build_key_words(record_date, state, details=None):
+    """
+        The searchable text of a health record.
+        The date parts are kept so they can be matched as text too.
+    """
+    key_words = f"{timezone.localtime(record_date).strftime('%B %b %d, %Y %I %M %I:%M %p')} {state}"
+    if details:
+        key_words += f" {details}"
+    return key_words
+
+
+def parse_search(text):
+    """
+        Splits a search like "march 2021 elevated" into date parts
+        and the remaining text terms
+    """
+    year = month = day = None
+    numbers = []
+    terms = []
+
+    for token in TOKEN.findall((text or "").lower()):
+        if token in MONTHS and month is None:
+            month = MONTHS[token]
+        elif token.isdigit() and len(token) == 4 and year is None:
+            year = int(token)
+        elif token.isdigit() and len(token) <= 2:
+            numbers.append(token)
+        else:
+            terms.append(token)
+
+    # A day only makes sense with a month, otherwise keep it as text
+    for number in numbers:
+        if month and day is None and 1 <= int(number) <= 31:
+            day = int(number)
+        else:
+            terms.append(number)
+
+    return ParsedSearch(year, month, day, terms)
+
+
+def date_filter(parsed):
+    """
+        Turns the date parts into record_date predicates. Whenever the year is
+        known it is a plain range so the record_date indexes can be used.
+    """
+    if parsed.year is None:
+        query = Q()
+        if parsed.month:
+            query &= Q(record_date__month=parsed.month)
+        if parsed.day:
+            query &= Q(record_date__day=parsed.day)
+        return query
+
+    current_timezone = timezone.get_current_timezone()
+
+    try:
+        if parsed.month and parsed.day:
+            start = datetime(parsed.year, parsed.month, parsed.day)
+            end = datetime.fromordinal(start.toordinal() + 1)
+        elif parsed.month:
+            start = datetime(parsed.year, parsed.month, 1)
+            end = datetime(parsed.year + parsed.month // 12, parsed.month % 12 + 1, 1)
+        else:
+            start = datetime(parsed.year, 1, 1)
+            end = datetime(parsed.year + 1, 1, 1)
+    except ValueError:
+        # Impossible dates like february 31 never match
+        return Q(pk__in=[])
+
+    return Q(record_date__gte=timezone.make_aware(start, current_timezone),
+             record_date__lt=timezone.make_aware(end, current_timezone))
+
+
+def postgres_prefix_query(terms):
+    """
+        The to_tsquery text matching every term as a prefix like the FTS5
+        "term"* queries, e.g. ['jog', '10:30'] gives 'jog':* & '10' <-> '30':*
+    """
+    def lexeme(word):
+        return "'" + word.replace("\\", "\\\\").replace("'", "''") + "'"
+
+    phrases = []
+    for term in terms:
+        # The time parts are separate tokens, keep them in order like a phrase
+        words = [word for word in term.split(":") if word]
+        if words:
+            phrases.append(" <-> ".join([lexeme(word) for word in words[:-1]] + [f"{lexeme(words[-1])}:*"]))
+    return " & ".join(phrases)
+
+
+def text_filter(queryset, terms):
+    """
+        Matches every term against the key words using the full text index of
+        the database: a GIN index on postgres, a FTS5 table on SQLite
+    """
+    if not terms:
+        return queryset
+
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        # Must match the expression of the GIN index, see create_postgres_search_index
+        return queryset.annotate(
+            key_words_search=SearchVector('key_words', config='simple')
+        ).filter(key_words_search=SearchQuery(postgres_prefix_query(terms), search_type='raw', config='simple'))
+
+    if connection.vendor == 'sqlite' and _has_sqlite_search_table(connection):
+        match = " ".join(f'"{term}"*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {SQLITE_SEARCH_TABLE} WHERE {SQLITE_SEARCH_TABLE} MATCH %s", (match,)))
+
+    for term in terms:
+        queryset = queryset.filter(key_words__icontains=term)
+    return queryset
+
+
+def _has_sqlite_search_table(connection):
+    key = (connection.alias, connection.settings_dict['NAME'])
+    if key not in _sqlite_search_tables:
+        _sqlite_search_tables[key] = SQLITE_SEARCH_TABLE in connection.introspection.table_names()
+    return _sqlite_search_tables[key]
+
+
+def search_records(queryset, text):
+    parsed = parse_search(text)
+    return text_filter(queryset.filter(date_filter(parsed)), parsed.terms)
+
+
+def create_postgres_search_index(schema_editor):
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {POSTGRES_SEARCH_INDEX} ON healthcare_healthrecord "
+        f"USING GIN (to_tsvector('simple'::regconfig, COALESCE(key_words, '')))"
+    )
+
+
+def create_sqlite_search_index(schema_editor):
+    """
+        Creates the FTS5 table over healthcare_healthrecord.key_words and the
+        triggers keeping it in sync. SQLite drops the triggers whenever a
+        migration rebuilds healthcare_healthrecord, call this again after those.
+    """
+    table = SQLITE_SEARCH_TABLE
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"key_words, content='healthcare_healthrecord', content_rowid='id')"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON healthcare_healthrecord BEGIN "
+        f"INSERT INTO {table}(rowid, key_words) VALUES (new.id, new.key_words); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON healthcare_healthrecord BEGIN "
+        f"INSERT INTO {table}({table}, rowid, key_words) VALUES ('delete', old.id, old.key_words); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE OF key_words ON healthcare_healthrecord BEGIN "
+        f"INSERT INTO {table}({table}, rowid, key_words) VALUES ('delete', old.id, old.key_words); "
+        f"INSERT INTO {table}(rowid, key_words) VALUES (new.id, new.key_words); END"
+    )
+    schema_editor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {POSTGRES_SEARCH_INDEX}")
+    elif vendor == 'sqlite':
+        for suffix in ("insert", "delete", "update"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {SQLITE_SEARCH_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}")
@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent whenever health records are written, including the bulk paths that
+# skip save(). The sender is the child record model when only records of one
+# type were written, HealthRecord otherwise. Arguments: user_days, a dict of
+# user id to the set of local dates touched, and using, the database alias.
+records_changed = Signal()
@@ -1,19 +1,83 @@
-from django.test import TestCase
-
-from .models import BloodPressure, BodyPhysique
+import json
+from io import StringIO
+from urllib.parse import urlencode
+from array import array
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.db.models import Count
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.views.generic import View
+
+from core.date_ranges import DateRangeResolver, InvalidDateRange, subtract_month
+from users.models import Profile
+from users.tokens import issue_token
+
+from .aggregations import (BLOOD_PRESSURE_METRICS, aggregate_buckets, blood_pressure_series, body_physique_series,
+                           pick_bucket)
+from .cache import LATEST_RECORD_KEY, get_latest_record, get_record_version
+from .mixins import OwnerRecordRequiredMixin
+from .models import ArchivedHealthRecord, BloodPressure, BodyPhysique, DailyHealthSummary, HealthRecord
+from .search import ParsedSearch, parse_search, postgres_prefix_query
 
 # View testcases
 
-class ViewsTestCases(TestCase):
+class ViewsTestCases(TransactionTestCase):
+    """
+        The record version only moves on commit, hence the transaction test case
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('viewer', 'viewer@example.com', 'password')
+        BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
 
     def test_retrieving_dashboard(self):
-        pass
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('healthcare:dashboard'))
+        self.assertContains(response, "119/70")
+
+        # Only the session and the user are read on repeat loads
+        with CaptureQueriesContext(connection) as queries:
+            repeat = self.client.get(reverse('healthcare:dashboard'))
+        self.assertEqual(repeat.content, response.content)
+        self.assertFalse([query for query in queries.captured_queries if 'healthcare_' in query['sql']])
+
+        # Only the readings are cached, the greeting follows the user
+        self.user.first_name = "Renamed"
+        self.user.save()
+        self.assertContains(self.client.get(reverse('healthcare:dashboard')), "Hello, Renamed")
+
+        # A new reading moves the record version
+        BloodPressure.objects.create(user=self.user, systolic_pressure=130, diastolic_pressure=85)
+        self.assertContains(self.client.get(reverse('healthcare:dashboard')), "130/85")
+
+        HealthRecord.objects.filter(user=self.user).deactivate()
+        self.assertContains(self.client.get(reverse('healthcare:dashboard')), "No blood pressure recorded yet")
 
     def test_retrieving_dashboard_with_unauthenticated_credentials(self):
-        pass
+        response = self.client.get(reverse('healthcare:dashboard'))
+        self.assertRedirects(response, f"{reverse('users:login')}?next={reverse('healthcare:dashboard')}",
+                             fetch_redirect_response=False)
 
     def test_retrieving_dashboard_of_with_invalid_credentials(self):
-        pass
+        other = get_user_model().objects.create_user('other', 'other@example.com', 'password')
+        self.client.force_login(other)
+        response = self.client.get(reverse('healthcare:dashboard'))
+        self.assertNotContains(response, "119/70")
 
 # Model testcases
 
@@ -101,6 +165,52 @@ class BloodPressureTestCases(TestCase):
         to_test = BloodPressure(systolic_pressure=100,diastolic_pressure=59)
         self.assertEqual(to_test.state, BloodPressure.states.get('low'))
 
+    def test_classify_many_matches_state(self):
+        systolic = array('i')
+        diastolic = array('i')
+        for systolic_pressure in range(0, 260):
+            for diastolic_pressure in range(0, 160):
+                systolic.append(systolic_pressure)
+                diastolic.append(diastolic_pressure)
+
+        expected = [BloodPressure(systolic_pressure=s, diastolic_pressure=d).state
+                    for s, d in zip(systolic, diastolic)]
+        self.assertEqual(BloodPressure.classify_many(systolic, diastolic), expected)
+
+    def test_classify_many_outside_validated_range(self):
+        classified = BloodPressure.classify_many([1200, -5], [70, 70])
+        self.assertEqual(classified, [BloodPressure.states.get('risky'), BloodPressure.states.get('low')])
+
+        # Unsigned columns skip the negative check and fall back past the lookups
+        classified = BloodPressure.classify_many(array('H', [100, 1200]), array('H', [70, 70]))
+        self.assertEqual(classified, [BloodPressure.states.get('normal'), BloodPressure.states.get('risky')])
+
+    def test_classify_query_set(self):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        BloodPressure.objects.create(user=user, systolic_pressure=119, diastolic_pressure=70)
+        BloodPressure.objects.create(user=user, systolic_pressure=181, diastolic_pressure=90)
+
+        classified = BloodPressure.active_objects.filter(user=user).order_by('pk').classify()
+        self.assertEqual(classified, [BloodPressure.states.get('normal'), BloodPressure.states.get('risky')])
+
+    def test_with_state_matches_state(self):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        readings = [(119, 70), (90, 60), (129, 79), (139, 70), (90, 80), (140, 70), (119, 120),
+                    (181, 90), (119, 121), (89, 70), (100, 59), (125, 85)]
+        for systolic_pressure, diastolic_pressure in readings:
+            BloodPressure.objects.create(user=user, systolic_pressure=systolic_pressure,
+                                         diastolic_pressure=diastolic_pressure)
+
+        for reading in BloodPressure.active_objects.with_state():
+            self.assertEqual(reading.record_state, reading.state)
+
+        risky = BloodPressure.active_objects.with_state().filter(record_state=BloodPressure.states.get('risky'))
+        self.assertEqual(risky.count(), 2)
+
+        counts = dict(BloodPressure.active_objects.with_state().values('record_state')
+                      .annotate(total=Count('pk')).values_list('record_state', 'total'))
+        self.assertEqual(counts[BloodPressure.states.get('low')], 2)
+
 class BodyPhysiqueTestCases(TestCase):
     """
         Body Physique Test Cases
@@ -111,23 +221,785 @@ class BodyPhysiqueTestCases(TestCase):
         to_test = BodyPhysique(height_in_centimeters=162,weight_in_kilograms=65)
         self.assertEqual(to_test.bmi_state, BodyPhysique.states.get('normal'))
 
+    def test_with_state_matches_bmi_state(self):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        physiques = [(162, 65), (170, 50), (170, 80), (160, 90), (Decimal('175.5'), Decimal('70.25'))]
+        for height, weight in physiques:
+            BodyPhysique.objects.create(user=user, height_in_centimeters=height, weight_in_kilograms=weight)
+
+        for physique in BodyPhysique.active_objects.with_state():
+            self.assertEqual(physique.record_bmi, physique.bmi)
+            self.assertEqual(physique.record_state, physique.bmi_state)
+
+        obese = BodyPhysique.active_objects.with_state().filter(record_state=BodyPhysique.states.get('obese'))
+        self.assertEqual(obese.count(), 1)
+
+    def bmi_state_of(self, bmi):
+        # At 1 meter the bmi is the weight
+        return BodyPhysique(height_in_centimeters=100, weight_in_kilograms=Decimal(bmi)).bmi_state
+
     def test_lower_bmi_borderline_normal(self):
-        pass
+        self.assertEqual(self.bmi_state_of('18.50'), BodyPhysique.states.get('normal'))
 
     def test_upper_bmi_borderline_over(self):
-        pass
+        self.assertEqual(self.bmi_state_of('29.99'), BodyPhysique.states.get('over'))
 
     def test_lower_bmi_borderline_over(self):
-        pass
+        self.assertEqual(self.bmi_state_of('25'), BodyPhysique.states.get('over'))
 
     def test_upper_bmi_borderline_obese(self):
-        pass
+        self.assertEqual(self.bmi_state_of('999'), BodyPhysique.states.get('obese'))
 
     def test_lower_bmi_borderline_obese(self):
-        pass
+        self.assertEqual(self.bmi_state_of('30'), BodyPhysique.states.get('obese'))
 
     def test_upper_bmi_borderline_under(self):
-        pass
+        self.assertEqual(self.bmi_state_of('18.49'), BodyPhysique.states.get('under'))
+        self.assertEqual(self.bmi_state_of('24.99'), BodyPhysique.states.get('normal'))
 
     def test_lower_bmi_borderline_under(self):
-        pass
\ No newline at end of file
+        self.assertEqual(self.bmi_state_of('1'), BodyPhysique.states.get('under'))
+
+    def test_bmi_matches_decimal_formula(self):
+        pairs = [(Decimal('65'), Decimal('162')), (Decimal('70.25'), Decimal('175.5')),
+                 (Decimal('0.96'), Decimal('160')), (Decimal('65.123'), Decimal('162'))]
+        for weight, height in pairs:
+            expected = round(weight / ((height * Decimal(0.01))**2), 2)
+            self.assertEqual(str(BodyPhysique.compute_bmi(weight, height)), str(expected))
+        # Exact halves round down like the Decimal formula
+        self.assertEqual(BodyPhysique.compute_bmi(Decimal('0.96'), Decimal('160')), Decimal('0.37'))
+
+    def test_stored_bmi(self):
+        user = get_user_model().objects.create_user('stored', 'stored@example.com', 'password')
+        saved = BodyPhysique.objects.create(user=user, height_in_centimeters=162, weight_in_kilograms=65)
+        ingested, = BodyPhysique.objects.bulk_ingest([
+            {'user': user, 'height_in_centimeters': 160, 'weight_in_kilograms': 90}
+        ])
+        self.assertEqual((saved.stored_bmi, saved.stored_bmi_state), (Decimal('24.77'), saved.bmi_state))
+        self.assertEqual(BodyPhysique.objects.get(pk=ingested.pk).stored_bmi_state, BodyPhysique.states.get('obese'))
+
+        # Writes around save() are caught up by the recompute command
+        BodyPhysique.objects.filter(pk=saved.pk).update(weight_in_kilograms=90)
+        call_command('recompute_bmi', stdout=StringIO())
+
+        obese = BodyPhysique.active_objects.filter(stored_bmi__gt=30).order_by('-stored_bmi')
+        self.assertEqual(list(obese.values_list('stored_bmi', flat=True)), [Decimal('35.16'), Decimal('34.29')])
+
+    def test_bmi_follows_weight_changes(self):
+        physique = BodyPhysique(height_in_centimeters=162, weight_in_kilograms=65)
+        self.assertEqual(physique.bmi, Decimal('24.77'))
+        physique.weight_in_kilograms = 67
+        self.assertEqual(physique.bmi, Decimal('25.53'))
+        self.assertEqual(BodyPhysique.states_of([physique]), [BodyPhysique.states.get('over')])
+
+    def test_stored_bmi_migration_matches_model(self):
+        # The migration keeps a frozen copy of the bmi, it must agree with the model it backfilled for
+        migration = import_module('healthcare.migrations.0007_bodyphysique_stored_bmi')
+        for weight in (Decimal('0.96'), Decimal('48.5'), Decimal('65'), Decimal('70.25'), Decimal('120.01')):
+            for height in (Decimal('150'), Decimal('160'), Decimal('162'), Decimal('175.5')):
+                bmi = migration.compute_bmi(weight, height)
+                self.assertEqual(bmi, BodyPhysique.compute_bmi(weight, height))
+                self.assertEqual(migration.state_of_bmi(bmi), BodyPhysique.state_of_bmi(bmi))
+
+
+class HealthRecordTestCases(TestCase):
+    """
+        Health Record Test Cases
+    """
+
+    def test_mixed_timeline_resolves_children_in_one_query(self):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        for _ in range(5):
+            BloodPressure.objects.create(user=user, systolic_pressure=119, diastolic_pressure=70)
+            BodyPhysique.objects.create(user=user, height_in_centimeters=162, weight_in_kilograms=65)
+
+        with self.assertNumQueries(1):
+            records = list(HealthRecord.active_objects.filter(user=user).with_children())
+            states = [record.state for record in records]
+            record_types = [record.get_record_type() for record in records]
+
+        self.assertEqual(states.count(BloodPressure.states.get('normal')), 5)
+        self.assertEqual(states.count(BodyPhysique.states.get('normal')), 5)
+        self.assertEqual(record_types.count(HealthRecord.record_types.get('body_physique')), 5)
+
+    def test_record_type_of_child_record(self):
+        self.assertEqual(BloodPressure().get_record_type(), HealthRecord.record_types.get('blood_pressure'))
+        self.assertEqual(BodyPhysique().get_record_type(), HealthRecord.record_types.get('body_physique'))
+
+    def test_record_type_is_stored(self):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        blood_pressure = BloodPressure.objects.create(user=user, systolic_pressure=119, diastolic_pressure=70)
+        body_physique = BodyPhysique.objects.create(user=user, height_in_centimeters=162, weight_in_kilograms=65)
+
+        self.assertEqual(list(HealthRecord.active_objects.blood_pressures().values_list('pk', flat=True)),
+                         [blood_pressure.pk])
+        self.assertEqual(list(HealthRecord.active_objects.body_physiques().values_list('pk', flat=True)),
+                         [body_physique.pk])
+
+        with self.assertNumQueries(1):
+            record = HealthRecord.active_objects.get(pk=body_physique.pk)
+            self.assertEqual(record.get_record_type(), HealthRecord.record_types.get('body_physique'))
+
+    def test_bulk_ingest(self):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        readings = [{'user': user, 'systolic_pressure': 119, 'diastolic_pressure': 70},
+                    BloodPressure(user=user, systolic_pressure=181, diastolic_pressure=90, details="dizzy")]
+
+        ingested = BloodPressure.objects.bulk_ingest(readings, batch_size=1)
+
+        self.assertTrue(all(record.pk for record in ingested))
+        saved = BloodPressure.active_objects.filter(user=user).order_by('pk')
+        self.assertEqual([record.state for record in saved],
+                         [BloodPressure.states.get('normal'), BloodPressure.states.get('risky')])
+        self.assertEqual(list(HealthRecord.active_objects.blood_pressures().values_list('pk', flat=True)),
+                         [record.pk for record in ingested])
+        self.assertEqual(list(HealthRecord.active_objects.search("dizzy").values_list('pk', flat=True)),
+                         [ingested[1].pk])
+
+    def test_bulk_ingest_needs_a_child_record(self):
+        with self.assertRaises(ValueError):
+            HealthRecord.objects.bulk_ingest([])
+
+
+class LatestRecordCacheTestCases(TransactionTestCase):
+    """
+        The latest record cache only updates on commit, hence the transaction test case
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+
+    def test_latest_record_is_read_from_cache(self):
+        BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
+        get_latest_record(BloodPressure, self.user)
+
+        with self.assertNumQueries(0):
+            latest = get_latest_record(BloodPressure, self.user)
+        self.assertEqual(latest.pressure, "119/70")
+
+    def test_missing_record_is_cached(self):
+        self.assertIsNone(get_latest_record(BodyPhysique, self.user))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_latest_record(BodyPhysique, self.user))
+
+    def test_save_writes_through(self):
+        self.assertIsNone(get_latest_record(BloodPressure, self.user))
+        BloodPressure.objects.create(user=self.user, systolic_pressure=130, diastolic_pressure=85)
+
+        with self.assertNumQueries(0):
+            latest = get_latest_record(BloodPressure, self.user)
+        self.assertEqual(latest.pressure, "130/85")
+
+    def test_soft_delete_invalidates(self):
+        older = BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
+        newer = BloodPressure.objects.create(user=self.user, systolic_pressure=130, diastolic_pressure=85)
+        self.assertEqual(get_latest_record(BloodPressure, self.user).pk, newer.pk)
+
+        newer.is_active = False
+        newer.save()
+        self.assertEqual(get_latest_record(BloodPressure, self.user).pk, older.pk)
+
+        # Through the parent record too
+        record = HealthRecord.objects.get(pk=older.pk)
+        record.is_active = False
+        record.save()
+        self.assertIsNone(get_latest_record(BloodPressure, self.user))
+
+    def test_bulk_deactivate_invalidates(self):
+        BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
+        self.assertIsNotNone(get_latest_record(BloodPressure, self.user))
+
+        HealthRecord.objects.filter(user=self.user).deactivate()
+        self.assertIsNone(get_latest_record(BloodPressure, self.user))
+
+        HealthRecord.objects.filter(user=self.user).restore()
+        self.assertEqual(get_latest_record(BloodPressure, self.user).pressure, "119/70")
+
+    def test_plain_values_are_cached(self):
+        record = BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
+        get_latest_record(BloodPressure, self.user)
+
+        cached = cache.get(LATEST_RECORD_KEY.format(record_type_name="blood_pressure", user_id=self.user.pk))
+        self.assertNotIsInstance(cached['values'], BloodPressure)
+        self.assertIn(record.pk, cached['values'])
+
+        latest = get_latest_record(BloodPressure, self.user)
+        self.assertEqual(latest.pk, record.pk)
+        self.assertFalse(latest._state.adding)
+
+    def test_hard_delete_invalidates(self):
+        older = BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
+        newer = BloodPressure.objects.create(user=self.user, systolic_pressure=130, diastolic_pressure=85)
+        self.assertEqual(get_latest_record(BloodPressure, self.user).pk, newer.pk)
+        version = get_record_version(self.user.pk)
+
+        newer.delete()
+        self.assertEqual(get_latest_record(BloodPressure, self.user).pk, older.pk)
+        self.assertNotEqual(get_record_version(self.user.pk), version)
+
+        # Through a parent query set too
+        HealthRecord.objects.filter(pk=older.pk).delete()
+        self.assertIsNone(get_latest_record(BloodPressure, self.user))
+
+    def test_bulk_ingest_invalidates(self):
+        self.assertIsNone(get_latest_record(BloodPressure, self.user))
+        BloodPressure.objects.bulk_ingest([{'user': self.user, 'systolic_pressure': 119, 'diastolic_pressure': 70}])
+        self.assertEqual(get_latest_record(BloodPressure, self.user).pressure, "119/70")
+
+
+class SearchTestCases(TestCase):
+    """
+        Health record search test cases
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        current_timezone = timezone.get_current_timezone()
+        self.march = BloodPressure.objects.create(
+            user=self.user, systolic_pressure=125, diastolic_pressure=70,
+            record_date=timezone.make_aware(datetime(2021, 3, 3, 9, 30), current_timezone))
+        self.april = BloodPressure.objects.create(
+            user=self.user, systolic_pressure=119, diastolic_pressure=70, details="after jogging",
+            record_date=timezone.make_aware(datetime(2021, 4, 1, 0, 15), current_timezone))
+        self.last_year = BodyPhysique.objects.create(
+            user=self.user, height_in_centimeters=162, weight_in_kilograms=65,
+            record_date=timezone.make_aware(datetime(2020, 3, 3, 23, 59), current_timezone))
+
+    def search(self, text):
+        return set(HealthRecord.active_objects.search(text).values_list('pk', flat=True))
+
+    def test_parse_search(self):
+        self.assertEqual(parse_search("March 3 2021 elevated"), ParsedSearch(2021, 3, 3, ['elevated']))
+        self.assertEqual(parse_search("12 normal"), ParsedSearch(None, None, None, ['normal', '12']))
+
+    def test_postgres_prefix_query(self):
+        # Prefix matches on postgres too, like the "term"* queries of SQLite
+        self.assertEqual(postgres_prefix_query(['jog', '10:30']), "'jog':* & '10' <-> '30':*")
+
+    def test_search_by_month_and_state(self):
+        self.assertEqual(self.search("march 2021 elevated"), {self.march.pk})
+        self.assertEqual(self.search("march 2021 normal"), set())
+
+    def test_search_by_date(self):
+        self.assertEqual(self.search("mar 3"), {self.march.pk, self.last_year.pk})
+        self.assertEqual(self.search("2020"), {self.last_year.pk})
+        self.assertEqual(self.search("april 1, 2021"), {self.april.pk})
+
+    def test_search_by_details(self):
+        self.assertEqual(self.search("jog"), {self.april.pk})
+
+    def test_key_words_migration_matches_model(self):
+        # Records saved before the search index kept their legacy key words until the backfill
+        migration = import_module('healthcare.migrations.0009_backfill_key_words')
+        expected = dict(HealthRecord.objects.values_list('pk', 'key_words'))
+        HealthRecord.objects.update(key_words="legacy")
+
+        migration.backfill_key_words(apps, mock.Mock(connection=connection))
+        self.assertEqual(dict(HealthRecord.objects.values_list('pk', 'key_words')), expected)
+        self.assertEqual(self.search("jog"), {self.april.pk})
+
+        for systolic in range(70, 200, 3):
+            for diastolic in range(40, 140, 3):
+                record = BloodPressure(systolic_pressure=systolic, diastolic_pressure=diastolic)
+                self.assertEqual(migration.blood_pressure_state(systolic, diastolic), record.state)
+
+
+class ExportTestCases(TestCase):
+    """
+        Health record export test cases
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        current_timezone = timezone.get_current_timezone()
+        BloodPressure.objects.create(
+            user=self.user, systolic_pressure=181, diastolic_pressure=90,
+            record_date=timezone.make_aware(datetime(2021, 3, 3, 9, 30), current_timezone))
+        BodyPhysique.objects.create(
+            user=self.user, height_in_centimeters=162, weight_in_kilograms=65,
+            record_date=timezone.make_aware(datetime(2021, 3, 4, 9, 30), current_timezone))
+
+    def test_export_requires_login(self):
+        response = self.client.get(reverse('healthcare:export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_ndjson(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('healthcare:export'), {'format': 'ndjson'})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual([row['state'] for row in rows],
+                         [BloodPressure.states.get('risky'), BodyPhysique.states.get('normal')])
+        self.assertEqual(rows[0]['pressure'], "181/90")
+        self.assertEqual(rows[1]['bmi'], "24.77")
+        self.assertEqual(rows[0]['formatted_record_date'], "March 03, 2021, 09:30 AM")
+
+    def test_export_csv(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('healthcare:export'))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("id,record_type"))
+
+    def test_export_command(self):
+        output = StringIO()
+        call_command('export_health_records', 'reader@example.com', '--format', 'ndjson', stdout=output)
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([row['pressure'] for row in rows], ["181/90", None])
+
+    def test_export_unknown_format(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('healthcare:export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AggregationTestCases(TestCase):
+    """
+        Graph aggregation test cases
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        current_timezone = timezone.get_current_timezone()
+
+        def at(day, hour):
+            return timezone.make_aware(datetime(2021, 3, day, hour), current_timezone)
+
+        # Late at night local time, a different UTC day
+        BloodPressure.objects.create(user=self.user, systolic_pressure=120, diastolic_pressure=70, record_date=at(1, 1))
+        BloodPressure.objects.create(user=self.user, systolic_pressure=140, diastolic_pressure=90, record_date=at(1, 23))
+        BloodPressure.objects.create(user=self.user, systolic_pressure=110, diastolic_pressure=60, record_date=at(9, 8))
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=65,
+                                    record_date=at(1, 8))
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=67,
+                                    record_date=at(2, 8))
+
+        self.from_date = at(1, 0)
+        self.until_date = at(31, 23)
+
+    def test_pick_bucket(self):
+        self.assertEqual(pick_bucket(self.from_date, self.until_date), 'day')
+        self.assertEqual(pick_bucket(self.from_date, self.from_date + timedelta(days=700)), 'week')
+        self.assertEqual(pick_bucket(self.from_date, self.from_date + timedelta(days=3650)), 'month')
+        # Requested buckets are kept unless they are too fine for the range
+        self.assertEqual(pick_bucket(self.from_date, self.until_date, 'week'), 'week')
+        self.assertEqual(pick_bucket(self.from_date, self.from_date + timedelta(days=700), 'day'), 'week')
+        # The "all" preset starts in 1970, too many months
+        self.assertEqual(pick_bucket(timezone.make_aware(datetime(1970, 1, 1)), self.until_date, 'month'), 'year')
+
+    def test_daily_blood_pressure(self):
+        bucket, points = blood_pressure_series(self.user, self.from_date, self.until_date)
+
+        self.assertEqual(bucket, 'day')
+        self.assertEqual([point['bucket'] for point in points], [date(2021, 3, 1), date(2021, 3, 9)])
+        self.assertEqual(points[0]['count'], 2)
+        self.assertEqual(points[0]['systolic'], {'min': 120, 'max': 140, 'mean': 130})
+        self.assertEqual(points[0]['diastolic'], {'min': 70, 'max': 90, 'mean': 80})
+
+    def test_monthly_body_physique(self):
+        bucket, points = body_physique_series(self.user, self.from_date, self.until_date, 'month')
+
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0]['bucket'], date(2021, 3, 1))
+        self.assertEqual(points[0]['weight'], {'min': 65, 'max': 67, 'mean': 66})
+        self.assertEqual(points[0]['bmi'], {'min': 24.77, 'max': 25.53, 'mean': 25.15})
+
+    def test_graph_api(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('healthcare:blood_pressure_graph'),
+                                   {'from_date': '2021-03-01', 'until_date': '2021-03-31', 'bucket': 'week'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['bucket'], 'week')
+        self.assertEqual([point['count'] for point in response.json()['points']], [2, 1])
+
+    def test_graph_api_coarsens_a_too_fine_bucket(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('healthcare:blood_pressure_graph'), {'range': 'all', 'bucket': 'day'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['bucket'], 'year')
+        self.assertEqual([(point['bucket'], point['count']) for point in response.json()['points']],
+                         [("2021-01-01", 3)])
+
+    def test_graph_api_requires_login(self):
+        response = self.client.get(reverse('healthcare:body_physique_graph'))
+        self.assertEqual(response.status_code, 403)
+
+
+class DailyHealthSummaryTestCases(TestCase):
+    """
+        Daily rollup test cases
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        self.current_timezone = timezone.get_current_timezone()
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime(2021, 3, day, hour, minute), self.current_timezone)
+
+    def test_summary_follows_saves(self):
+        first = BloodPressure.objects.create(user=self.user, systolic_pressure=120, diastolic_pressure=70,
+                                             record_date=self.at(1, 23))
+        BloodPressure.objects.create(user=self.user, systolic_pressure=140, diastolic_pressure=90,
+                                     record_date=self.at(1, 8))
+        BloodPressure.objects.create(user=self.user, systolic_pressure=145, diastolic_pressure=90,
+                                     record_date=self.at(1, 9))
+
+        summary = DailyHealthSummary.objects.get(user=self.user, day=date(2021, 3, 1))
+        self.assertEqual(summary.blood_pressure_count, 3)
+        self.assertEqual((summary.systolic_min, summary.systolic_max), (120, 145))
+        self.assertEqual(summary.blood_pressure_state, BloodPressure.states.get('very_high'))
+
+        # Moving a record to another day updates both days
+        first = BloodPressure.objects.get(pk=first.pk)
+        first.record_date = self.at(2, 8)
+        first.save()
+        self.assertEqual(DailyHealthSummary.objects.get(user=self.user, day=date(2021, 3, 1)).blood_pressure_count, 2)
+        self.assertEqual(DailyHealthSummary.objects.get(user=self.user, day=date(2021, 3, 2)).blood_pressure_count, 1)
+
+        # Soft deleting the last record of a day removes the summary
+        first.is_active = False
+        first.save()
+        self.assertFalse(DailyHealthSummary.objects.filter(user=self.user, day=date(2021, 3, 2)).exists())
+
+    def test_only_the_touched_days_and_columns_are_written(self):
+        moved = BloodPressure.objects.create(user=self.user, systolic_pressure=120, diastolic_pressure=70,
+                                             record_date=self.at(1, 8))
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=65,
+                                    record_date=self.at(15, 8))
+        # A day between the old and the new record date, marked to see whether it is rewritten
+        DailyHealthSummary.objects.filter(day=date(2021, 3, 15)).update(body_physique_count=7)
+
+        moved = BloodPressure.objects.get(pk=moved.pk)
+        moved.record_date = self.at(28, 8)
+        # The record, then lock, create and lock again, aggregate, update and delete the two summaries
+        with self.assertNumQueries(8):
+            moved.save()
+        self.assertEqual(DailyHealthSummary.objects.get(day=date(2021, 3, 15)).body_physique_count, 7)
+        self.assertFalse(DailyHealthSummary.objects.filter(day=date(2021, 3, 1)).exists())
+        self.assertEqual(DailyHealthSummary.objects.get(day=date(2021, 3, 28)).systolic_max, 120)
+
+        # A blood pressure on the day of the body physique keeps its columns
+        BloodPressure.objects.create(user=self.user, systolic_pressure=130, diastolic_pressure=80,
+                                     record_date=self.at(15, 9))
+        summary = DailyHealthSummary.objects.get(day=date(2021, 3, 15))
+        self.assertEqual((summary.blood_pressure_count, summary.body_physique_count), (1, 7))
+
+    def test_series_matches_raw_records(self):
+        for day in range(1, 29):
+            for hour in (7, 22):
+                BloodPressure.objects.create(user=self.user, systolic_pressure=100 + day + hour,
+                                             diastolic_pressure=60 + day, record_date=self.at(day, hour))
+        # Partial days at both edges of the range
+        from_date = self.at(3, 12)
+        until_date = self.at(20, 10)
+
+        records = BloodPressure.active_objects.filter(user=self.user, record_date__gte=from_date,
+                                                      record_date__lte=until_date)
+        for bucket in ('day', 'week', 'month'):
+            _, points = blood_pressure_series(self.user, from_date, until_date, bucket)
+            self.assertEqual(points, aggregate_buckets(records, BLOOD_PRESSURE_METRICS, bucket))
+
+    def test_rebuild_command(self):
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=65,
+                                    record_date=self.at(1, 8))
+        DailyHealthSummary.objects.all().delete()
+
+        call_command('rebuild_daily_summaries', stdout=StringIO())
+
+        summary = DailyHealthSummary.objects.get(user=self.user)
+        self.assertEqual(summary.body_physique_count, 1)
+        self.assertEqual(summary.bmi_mean, 24.77)
+        self.assertEqual(summary.bmi_state, BodyPhysique.states.get('normal'))
+
+    def test_command_drops_summaries_of_users_without_records(self):
+        record = BloodPressure.objects.create(user=self.user, systolic_pressure=120, diastolic_pressure=70)
+        HealthRecord.objects.filter(pk=record.pk).delete()
+        DailyHealthSummary.objects.create(user=self.user, day=date(2021, 3, 1), blood_pressure_count=1)
+
+        call_command('rebuild_daily_summaries', stdout=StringIO())
+        self.assertFalse(DailyHealthSummary.objects.exists())
+
+
+class DailyHealthSummaryTransactionTestCases(TransactionTestCase):
+    """
+        Records and their summaries are written in one transaction
+    """
+
+    def test_failed_rollup_rolls_the_save_back(self):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+
+        with mock.patch('healthcare.rollups._refresh', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            BloodPressure.objects.create(user=user, systolic_pressure=120, diastolic_pressure=70)
+        self.assertFalse(HealthRecord.objects.exists())
+
+
+class DateRangeTestCases(TestCase):
+    """
+        Makes sure the graph api date ranges are exact, month ends included
+    """
+
+    def setUp(self):
+        self.resolver = DateRangeResolver()
+        self.now = timezone.make_aware(datetime(2021, 3, 31, 15, 30))
+
+    def test_subtract_month(self):
+        self.assertEqual(subtract_month(datetime(2021, 3, 31, 15, 30)), datetime(2021, 2, 28, 15, 30))
+        self.assertEqual(subtract_month(datetime(2020, 3, 31)), datetime(2020, 2, 29))
+        self.assertEqual(subtract_month(datetime(2021, 1, 15)), datetime(2020, 12, 15))
+        self.assertEqual(subtract_month(datetime(2021, 5, 31)), datetime(2021, 4, 30))
+        self.assertEqual(subtract_month(datetime(2021, 7, 10)), datetime(2021, 6, 10))
+
+    def test_defaults_to_last_month(self):
+        from_date, until_date = self.resolver.resolve(now=self.now)
+        self.assertEqual(from_date, timezone.make_aware(datetime(2021, 2, 28, 15, 30)))
+        self.assertEqual(until_date, self.now)
+
+    def test_explicit_dates_cover_whole_days(self):
+        from_date, until_date = self.resolver.resolve("2021-01-05", "2021-01-06", now=self.now)
+        self.assertEqual(from_date, timezone.make_aware(datetime(2021, 1, 5)))
+        self.assertEqual(until_date, timezone.make_aware(datetime(2021, 1, 6, 23, 59, 59)))
+
+    def test_presets(self):
+        self.assertEqual(self.resolver.resolve(preset="7d", now=self.now)[0], self.now - timedelta(days=7))
+        self.assertEqual(self.resolver.resolve(preset="30d", now=self.now)[0], self.now - timedelta(days=30))
+        self.assertEqual(self.resolver.resolve(preset="ytd", now=self.now)[0],
+                         timezone.make_aware(datetime(2021, 1, 1)))
+        self.assertEqual(self.resolver.resolve(preset="all", now=self.now)[0],
+                         timezone.make_aware(datetime(1970, 1, 1)))
+
+    def test_invalid_ranges(self):
+        with self.assertRaises(InvalidDateRange):
+            self.resolver.resolve("2021-02-30")
+        with self.assertRaises(InvalidDateRange):
+            self.resolver.resolve(preset="forever")
+
+    def test_graph_api_rejects_invalid_dates(self):
+        user = get_user_model().objects.create_user(username="ranges", password="password")
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('healthcare:blood_pressure_graph'), {"from_date": "03/01/2021"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('healthcare:blood_pressure_graph'), {"range": "7d"})
+        self.assertEqual(response.status_code, 200)
+
+
+class CarryForwardHeightTestCases(TestCase):
+    """
+        Makes sure weight check ins get the height from the profile
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('checkin', 'checkin@example.com', 'password')
+        self.now = timezone.now()
+
+    def test_latest_height_is_carried(self):
+        self.assertIsNone(Profile.objects.current_height(self.user))
+
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=160, weight_in_kilograms=60,
+                                    record_date=self.now - timedelta(days=10))
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=61,
+                                    record_date=self.now)
+        # Backdated records do not replace the current height
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=158, weight_in_kilograms=59,
+                                    record_date=self.now - timedelta(days=5))
+        self.assertEqual(Profile.objects.current_height(self.user), 162)
+
+        BodyPhysique.objects.bulk_ingest([
+            {'user': self.user, 'height_in_centimeters': 163, 'weight_in_kilograms': 62,
+             'record_date': self.now + timedelta(days=1)}
+        ])
+        self.assertEqual(Profile.objects.current_height(self.user), 163)
+
+    def test_height_falls_back_when_its_record_goes(self):
+        older = BodyPhysique.objects.create(user=self.user, height_in_centimeters=160, weight_in_kilograms=60,
+                                            record_date=self.now - timedelta(days=10))
+        newer = BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=61,
+                                            record_date=self.now)
+
+        HealthRecord.objects.filter(pk=newer.pk).deactivate()
+        self.assertEqual(Profile.objects.current_height(self.user), 160)
+        HealthRecord.objects.filter(pk=newer.pk).restore()
+        self.assertEqual(Profile.objects.current_height(self.user), 162)
+
+        # Deactivated by saving, through the child and the parent
+        newer.is_active = False
+        newer.save()
+        self.assertEqual(Profile.objects.current_height(self.user), 160)
+        record = HealthRecord.objects.get(pk=older.pk)
+        record.is_active = False
+        record.save()
+        self.assertIsNone(Profile.objects.current_height(self.user))
+
+        HealthRecord.objects.filter(pk=older.pk).restore()
+        self.assertEqual(Profile.objects.current_height(self.user), 160)
+        older.delete()
+        self.assertIsNone(Profile.objects.current_height(self.user))
+
+        # A deleted user takes the records and the profile along
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=61)
+        self.user.delete()
+        self.assertFalse(Profile.objects.exists())
+
+    def test_record_weight_needs_a_height(self):
+        with self.assertRaises(ValueError):
+            BodyPhysique.objects.record_weight(self.user, 60)
+
+    def test_check_in_does_not_read_the_history(self):
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=61)
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('healthcare:weight_check_in'), {'weight_in_kilograms': '65'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['bmi'], "24.77")
+        # Only the daily rollup of today reads records, nothing looks for the latest one
+        latest_lookups = [query['sql'] for query in queries.captured_queries
+                          if 'healthcare_bodyphysique' in query['sql'] and 'ORDER BY' in query['sql']]
+        self.assertEqual(latest_lookups, [])
+
+
+class OwnerRecordRequiredTestCases(TestCase):
+    """
+        Makes sure the owner check loads the concrete record once
+    """
+
+    class RecordView(OwnerRecordRequiredMixin, View):
+        def get(self, *args, **kwargs):
+            record = self.get_object()
+            return HttpResponse(f"{record.record_type_name} {record.state}")
+
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user('owner', 'owner@example.com', 'password')
+        self.record = BloodPressure.objects.create(user=self.owner, systolic_pressure=120, diastolic_pressure=80)
+
+    def request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return self.RecordView.as_view()(request, id=self.record.pk)
+
+    def test_owner_gets_the_concrete_record_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.request(self.owner)
+        self.assertEqual(response.content.decode(), f"blood_pressure {self.record.state}")
+
+    def test_other_users_are_denied(self):
+        other = get_user_model().objects.create_user('other', 'other@example.com', 'password')
+        with self.assertRaises(PermissionDenied):
+            self.request(other)
+
+
+class SoftDeleteTestCases(TestCase):
+    """
+        Makes sure bulk deactivation keeps the derived data in sync and the
+        long deactivated records get archived
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('soft', 'soft@example.com', 'password')
+        self.day = timezone.make_aware(datetime(2021, 3, 2, 9))
+        self.pressure = BloodPressure.objects.create(user=self.user, systolic_pressure=120, diastolic_pressure=80,
+                                                     record_date=self.day)
+        self.physique = BodyPhysique.objects.create(user=self.user, height_in_centimeters=162,
+                                                    weight_in_kilograms=65, record_date=self.day)
+
+    def test_deactivate_and_restore(self):
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).deactivate(), 2)
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).deactivate(), 0)
+        self.assertFalse(HealthRecord.active_objects.filter(user=self.user).exists())
+        self.assertFalse(DailyHealthSummary.objects.filter(user=self.user).exists())
+
+        self.assertEqual(BloodPressure.objects.filter(user=self.user).restore(), 1)
+        summary = DailyHealthSummary.objects.get(user=self.user)
+        self.assertEqual((summary.blood_pressure_count, summary.body_physique_count), (1, 0))
+
+    def test_archive_inactive_records(self):
+        HealthRecord.objects.filter(pk=self.pressure.pk).deactivate()
+        call_command('archive_inactive_records', '--days', '30', stdout=StringIO())
+        self.assertFalse(ArchivedHealthRecord.objects.exists())
+
+        HealthRecord.objects.filter(pk=self.pressure.pk).update(date_updated=timezone.now() - timedelta(days=31))
+        call_command('archive_inactive_records', '--days', '30', stdout=StringIO())
+
+        archived = ArchivedHealthRecord.objects.get()
+        self.assertEqual(archived.record_id, self.pressure.pk)
+        self.assertEqual(archived.data['systolic_pressure'], "120")
+        self.assertEqual(list(HealthRecord.objects.values_list('pk', flat=True)), [self.physique.pk])
+        self.assertFalse(BloodPressure.objects.exists())
+
+    def test_archiving_skips_the_delete_receivers(self):
+        BodyPhysique.objects.bulk_ingest([{'user': self.user, 'height_in_centimeters': 150,
+                                           'weight_in_kilograms': 50, 'record_date': self.day - timedelta(days=day)}
+                                          for day in range(1, 51)])
+        HealthRecord.objects.filter(user=self.user).exclude(pk=self.physique.pk).deactivate()
+        HealthRecord.objects.filter(is_active=False).update(date_updated=timezone.now() - timedelta(days=31))
+        version = get_record_version(self.user.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('archive_inactive_records', '--days', '30', stdout=StringIO())
+
+        self.assertEqual(ArchivedHealthRecord.objects.count(), 51)
+        self.assertLess(len(queries), 15)
+        self.assertFalse([query for query in queries.captured_queries if 'users_profile' in query['sql']])
+        self.assertEqual(get_record_version(self.user.pk), version)
+
+
+class AsyncViewsTestCases(TransactionTestCase):
+    """
+        The async views read from worker threads with their own connections,
+        hence the transaction test case
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('async', 'async@example.com', 'password')
+        BloodPressure.objects.create(user=self.user, systolic_pressure=119, diastolic_pressure=70)
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=65)
+        self.async_client = AsyncClient()
+
+    def get(self, name, headers=None, **params):
+        # The query string goes in the path, the async client of Django 3.1 drops the data of get()
+        # and sends its extra keyword arguments as headers
+        return async_to_sync(self.async_client.get)(f"{reverse(f'healthcare:{name}')}?{urlencode(params)}",
+                                                    **(headers or {}))
+
+    def test_latest_readings(self):
+        self.async_client.force_login(self.user)
+        response = self.get('async_latest_readings')
+        self.assertEqual(response.status_code, 200)
+        readings = json.loads(response.content)
+        self.assertEqual(readings['blood_pressure']['pressure'], "119/70")
+        self.assertEqual(readings['body_physique']['bmi'], "24.77")
+
+    def test_graph_matches_the_sync_api(self):
+        self.async_client.force_login(self.user)
+        self.client.force_login(self.user)
+        params = {'range': '7d', 'bucket': 'day'}
+
+        response = self.get('async_blood_pressure_graph', **params)
+        expected = self.client.get(reverse('healthcare:blood_pressure_graph'), params).json()
+        self.assertEqual(json.loads(response.content)['points'], expected['points'])
+
+        self.assertEqual(self.get('async_body_physique_graph', bucket='hour').status_code, 400)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.get('async_latest_readings').status_code, 403)
+
+    def test_token_authentication(self):
+        # Device clients authenticate like on the sync api
+        token = issue_token(self.user)
+        response = self.get('async_latest_readings', headers={'authorization': f"JWT {token}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['blood_pressure']['pressure'], "119/70")
+
+        response = self.get('async_blood_pressure_graph', headers={'authorization': "JWT not-a-token"})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,18 @@
+from django.urls import path
+from .async_views import AsyncBloodPressureGraphView, AsyncBodyPhysiqueGraphView, AsyncLatestReadingsView
+from .views import (BloodPressureGraphApiView, BodyPhysiqueGraphApiView, DashboardView, HealthRecordExportView,
+                    LogoutView, WeightCheckInApiView)
+
+app_name = 'healthcare'
+
+urlpatterns = [
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('records/export/', HealthRecordExportView.as_view(), name='export'),
+    path('api/graph/blood-pressure/', BloodPressureGraphApiView.as_view(), name='blood_pressure_graph'),
+    path('api/graph/body-physique/', BodyPhysiqueGraphApiView.as_view(), name='body_physique_graph'),
+    path('api/async/graph/blood-pressure/', AsyncBloodPressureGraphView.as_view(), name='async_blood_pressure_graph'),
+    path('api/async/graph/body-physique/', AsyncBodyPhysiqueGraphView.as_view(), name='async_body_physique_graph'),
+    path('api/async/latest/', AsyncLatestReadingsView.as_view(), name='async_latest_readings'),
+    path('api/check-in/weight/', WeightCheckInApiView.as_view(), name='weight_check_in'),
+]
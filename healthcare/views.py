@@ -1,10 +1,25 @@
-
 from django.contrib.auth import logout
-from django.views.generic import View
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic import TemplateView, View
 from django.shortcuts import reverse
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.date_ranges import InvalidDateRange
+from core.routers import get_replica_alias, read_from_replica
 
-# NOTE: TODO create LoginRequiredMixin
+from .aggregations import BUCKETS, blood_pressure_series, body_physique_series
+from .cache import dashboard_timeout, get_record_version
+from .exports import EXPORT_FORMATS, export_lines
+from .forms import WeightCheckInForm
+from .mixins import ApiDateRangeMixin, BloodPressureMixin, BodyPhysiqueMixin
+from .models import BodyPhysique
 
 class LogoutView(View):
     """
@@ -12,4 +27,119 @@ class LogoutView(View):
     """
     def get(self, *args, **kwargs):
         logout(self.request)
-        return HttpResponseRedirect(reverse('users:login'))
\ No newline at end of file
+        return HttpResponseRedirect(reverse('users:login'))
+
+
+class DashboardView(LoginRequiredMixin, BloodPressureMixin, BodyPhysiqueMixin, TemplateView):
+    """
+        The logged in user's latest readings. The readings fragment is cached
+        per user and record version, so the records are only read again once
+        they change. The rest of the page, like the greeting, is rendered on
+        every request.
+    """
+    template_name = "healthcare/dashboard.html"
+
+    def get(self, *args, **kwargs):
+        response = super().get(*args, **kwargs)
+        patch_cache_control(response, private=True)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['record_version'] = get_record_version(self.request.user.pk)
+        context['dashboard_timeout'] = dashboard_timeout()
+        # Callables so the readings are only read when the fragment is not cached
+        context['latest_blood_pressure'] = self.get_my_latest_blood_pressure
+        context['latest_body_physique'] = self.get_my_latest_body_physique
+        return context
+
+
+class HealthRecordExportView(LoginRequiredMixin, View):
+    """
+        Streams the logged in user's whole health history as csv or ndjson
+    """
+    def get(self, *args, **kwargs):
+        export_format = self.request.GET.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}")
+
+        # Streamed after the view returns, so the replica is passed explicitly
+        lines = export_lines(self.request.user, export_format, using=get_replica_alias(self.request.user))
+        response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+        file_name = f"health-records-{timezone.localtime():%Y-%m-%d}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        return response
+
+
+class GraphApiView(ApiDateRangeMixin, APIView):
+    """
+        Base of the graph apis, returns the readings of the date range
+        aggregated per day, week, month or year
+    """
+    permission_classes = [IsAuthenticated]
+    series = None
+
+    def get(self, *args, **kwargs):
+        bucket = self.request.GET.get("bucket", None)
+        if bucket and bucket not in BUCKETS:
+            return Response({"bucket": f"Use one of: {', '.join(BUCKETS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            from_date, until_date = self.extract_from_date_and_until_date()
+        except InvalidDateRange as e:
+            return Response({"date_range": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        with read_from_replica(self.request.user):
+            bucket, points = self.series(self.request.user, from_date, until_date, bucket)
+
+        return Response({
+            "from_date": from_date,
+            "until_date": until_date,
+            "bucket": bucket,
+            "points": points,
+        })
+
+
+class BloodPressureGraphApiView(GraphApiView):
+    """
+        Systolic and diastolic pressures over time
+    """
+    series = staticmethod(blood_pressure_series)
+
+
+class BodyPhysiqueGraphApiView(GraphApiView):
+    """
+        Weight and bmi over time
+    """
+    series = staticmethod(body_physique_series)
+
+
+class WeightCheckInApiView(APIView):
+    """
+        Records the logged in user's weight, the height is carried forward
+        from the profile so a check in is a single record write
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, *args, **kwargs):
+        form = WeightCheckInForm(self.request.data)
+        if not form.is_valid():
+            return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            record = BodyPhysique.objects.record_weight(
+                self.request.user,
+                form.cleaned_data['weight_in_kilograms'],
+                height=form.cleaned_data['height_in_centimeters'],
+                details=form.cleaned_data['details'],
+            )
+        except ValueError as e:
+            return Response({"height_in_centimeters": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "id": record.pk,
+            "record_date": record.record_date,
+            "height": str(record.height),
+            "weight": str(record.weight),
+            "bmi": str(record.bmi),
+            "state": record.bmi_state,
+        }, status=status.HTTP_201_CREATED)
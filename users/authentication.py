@@ -0,0 +1,33 @@
+from django.utils.encoding import smart_str
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .tokens import InvalidToken, decode_token, jwt_setting, user_from_payload
+
+
+class JSONWebTokenAuthentication(BaseAuthentication):
+    """
+        Authorization: JWT <token>
+
+        The user comes from the token claims, neither the session nor the
+        user table is read.
+    """
+
+    def authenticate(self, request):
+        parts = get_authorization_header(request).split()
+        prefix = jwt_setting('JWT_AUTH_HEADER_PREFIX')
+
+        if not parts or smart_str(parts[0]).lower() != prefix.lower():
+            return None
+        if len(parts) != 2:
+            raise exceptions.AuthenticationFailed("Invalid Authorization header, expected a single token.")
+
+        try:
+            payload = decode_token(smart_str(parts[1]))
+        except InvalidToken as e:
+            raise exceptions.AuthenticationFailed(str(e))
+
+        return user_from_payload(payload), payload
+
+    def authenticate_header(self, request):
+        return f'{jwt_setting("JWT_AUTH_HEADER_PREFIX")} realm="api"'
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Value
+from django.db.models.functions import Upper
+
+# Everything a login needs: the password check and its upgrade, the session
+# hash, last_login and the token claims
+LOGIN_FIELDS = ('password', 'is_active', 'last_login', 'email', 'username')
+
+
+class EmailBackend(ModelBackend):
+    """
+        Authenticates authenticate(email=..., password=...) calls.
+
+        The email is matched case-insensitively in one query on the
+        UPPER(email) index and only the login columns are loaded. Inactive
+        users are returned so UserLogInForm can tell them they are deactivated.
+    """
+
+    def get_login_queryset(self, email):
+        return (get_user_model()._default_manager
+                .annotate(email_upper=Upper('email'))
+                # Both sides go through the database UPPER of the unique index, str.upper()
+                # folds characters that SQLite does not. email > '' is the index condition.
+                .filter(email_upper=Upper(Value(email)), email__gt="")
+                .only(*LOGIN_FIELDS))
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+
+        user = self.get_login_queryset(email).first()
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            get_user_model()().set_password(password)
+            return None
+
+        # check_password rehashes and saves when the hasher cost has changed
+        if user.check_password(password):
+            return user
+        return None
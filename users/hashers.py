@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+        PBKDF2 with the iterations of PASSWORD_HASHER_ITERATIONS. It keeps the
+        pbkdf2_sha256 name, so stored hashes of another cost are upgraded on
+        the user's next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASHER_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def backfill_profile_height(apps, schema_editor):
+    """
+        Carries the height of every user's latest body physique to a profile
+    """
+    BodyPhysique = apps.get_model('healthcare', 'BodyPhysique')
+    Profile = apps.get_model('users', 'Profile')
+
+    latest = {}
+    records = (BodyPhysique.objects.filter(is_active=True).order_by('user', '-record_date')
+               .values_list('user', 'height_in_centimeters', 'record_date'))
+    for user_id, height, record_date in records.iterator():
+        latest.setdefault(user_id, (height, record_date))
+
+    Profile.objects.bulk_create([
+        Profile(user_id=user_id, height_in_centimeters=height, height_recorded_at=record_date)
+        for user_id, (height, record_date) in latest.items()
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('healthcare', '0007_bodyphysique_stored_bmi'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_profile_height, migrations.RunPython.noop),
+    ]
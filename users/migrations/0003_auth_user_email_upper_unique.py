@@ -0,0 +1,23 @@
+from django.db import migrations
+
+EMAIL_INDEX = "users_auth_user_email_upper_uniq"
+
+
+class Migration(migrations.Migration):
+    """
+        A unique index on UPPER(email) for EmailBackend lookups. Blank emails
+        (e.g. superusers created without one) are left out. Fails if two
+        users share an email in different cases, merge them first.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_backfill_profile_height'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"CREATE UNIQUE INDEX {EMAIL_INDEX} ON auth_user (UPPER(email)) WHERE email > ''",
+            f"DROP INDEX {EMAIL_INDEX}",
+        ),
+    ]
@@ -1,3 +1,76 @@
+from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Q
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
 
-# Create your models here.
+from core.models import ActiveManager, ActiveQuerySet, CommonInfo
+
+
+class ProfileQuerySet(ActiveQuerySet):
+    """
+        Query set for profiles
+    """
+
+    def current_height(self, user):
+        """
+            The height carried forward from the user's latest body physique,
+            None when the user never recorded one
+        """
+        return self.filter(user=user).values_list('height_in_centimeters', flat=True).first()
+
+    def carry_height(self, user_id, height, recorded_at):
+        """
+            Stores the height unless a newer one is already stored, backdated
+            records do not override the current height
+        """
+        updated = self.filter(
+            Q(height_recorded_at__isnull=True) | Q(height_recorded_at__lte=recorded_at), user_id=user_id
+        ).update(height_in_centimeters=height, height_recorded_at=recorded_at)
+
+        if not updated:
+            self.get_or_create(user_id=user_id, defaults={
+                'height_in_centimeters': height,
+                'height_recorded_at': recorded_at,
+            })
+
+    def set_height(self, user_id, height, recorded_at):
+        """
+            Replaces the carried height, e.g. after the record it came from
+            was deactivated or deleted. Never creates a profile without one.
+        """
+        updated = self.filter(user_id=user_id).update(height_in_centimeters=height, height_recorded_at=recorded_at)
+        if not updated and height is not None:
+            self.get_or_create(user_id=user_id, defaults={
+                'height_in_centimeters': height,
+                'height_recorded_at': recorded_at,
+            })
+
+
+class Profile(CommonInfo):
+    """
+        Per user data that is not a health record, like the current height
+    """
+
+    user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, related_name='profile')
+
+    # Carried forward from the latest body physique so weight check ins do not search the history
+    height_in_centimeters = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True,
+                                                verbose_name="Height (cm)")
+    height_recorded_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ProfileQuerySet.as_manager()
+    active_objects = ActiveManager.from_queryset(ProfileQuerySet)()
+
+    def __str__(self):
+        return f"{self.user}"
+
+
+@receiver(pre_save, sender=get_user_model())
+def refuse_token_user_save(sender, instance, **kwargs):
+    """
+        A user built from token claims (users.tokens.user_from_payload) would
+        blank every field missing from the claims, like the password
+    """
+    if getattr(instance, 'from_token', False):
+        raise ValueError("The user of a token only holds its claims, load it from the database to save it.")
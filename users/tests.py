@@ -1,3 +1,144 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth import authenticate
+from django.db import IntegrityError, connection, transaction
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from healthcare.models import BodyPhysique
+
+from .forms import UserLogInForm
+from .models import Profile
+from .tokens import decode_token, issue_token, user_from_payload
+
+
+class TokenAuthenticationTestCases(TestCase):
+    """
+        Makes sure token requests are authenticated from the token alone
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('device', 'device@example.com', 'password')
+        BodyPhysique.objects.create(user=self.user, height_in_centimeters=162, weight_in_kilograms=61)
+
+    def test_token_requests_skip_the_session_and_user_tables(self):
+        token = issue_token(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('healthcare:weight_check_in'), {'weight_in_kilograms': '65'},
+                                        HTTP_AUTHORIZATION=f"JWT {token}")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(BodyPhysique.objects.filter(user=self.user).count(), 2)
+        tables = " ".join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('django_session', tables)
+        self.assertNotIn('auth_user', tables)
+
+    def test_token_user_reaches_its_profile(self):
+        # The check in carries the height from the profile of the token user
+        token = issue_token(self.user)
+        response = self.client.post(reverse('healthcare:weight_check_in'), {'weight_in_kilograms': '65'},
+                                    HTTP_AUTHORIZATION=f"JWT {token}")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['height'], "162")
+
+        user = user_from_payload(decode_token(token))
+        self.assertEqual(user.profile, Profile.objects.get(user=self.user))
+
+    def test_token_user_is_not_saved_nor_privileged(self):
+        self.user.is_superuser = True
+        self.user.save()
+        user = user_from_payload(decode_token(issue_token(self.user)))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(user.is_staff)
+            self.assertFalse(user.has_perm('healthcare.view_bloodpressure'))
+        with self.assertRaises(ValueError):
+            user.save()
+        self.assertTrue(get_user_model().objects.get(pk=self.user.pk).check_password('password'))
+
+    def test_invalid_tokens_are_rejected(self):
+        response = self.client.post(reverse('healthcare:weight_check_in'), {'weight_in_kilograms': '65'},
+                                    HTTP_AUTHORIZATION="JWT not-a-token")
+        self.assertEqual(response.status_code, 403)
+
+        with override_settings(JWT_AUTH={'JWT_EXPIRATION_DELTA': timedelta(seconds=-1)}):
+            expired = issue_token(self.user)
+        response = self.client.get(reverse('healthcare:blood_pressure_graph'), HTTP_AUTHORIZATION=f"JWT {expired}")
+        self.assertEqual(response.status_code, 403)
+
+    def test_refresh_keeps_the_original_login_time(self):
+        token = issue_token(self.user)
+        response = self.client.post(reverse('users:token_refresh'), {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode_token(response.json()['token'])['orig_iat'], decode_token(token)['orig_iat'])
+
+        with override_settings(JWT_AUTH={'JWT_REFRESH_EXPIRATION_DELTA': timedelta(seconds=-1)}):
+            response = self.client.post(reverse('users:token_refresh'), {'token': token})
+        self.assertEqual(response.status_code, 400)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post(reverse('users:token_refresh'), {'token': token})
+        self.assertEqual(response.status_code, 400)
+
+    def test_obtain_rejects_wrong_passwords(self):
+        response = self.client.post(reverse('users:token_obtain'),
+                                    {'email': 'device@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EmailBackendTestCases(TestCase):
+    """
+        Makes sure email logins are case-insensitive, cheap and upgrade hashes
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('patient', 'Patient@Example.com', 'password')
+
+    def test_email_is_case_insensitive_and_one_query(self):
+        with self.assertNumQueries(1):
+            user = authenticate(email='patient@example.COM', password='password')
+        self.assertEqual(user, self.user)
+        self.assertIsNone(authenticate(email='patient@example.com', password='wrong'))
+        self.assertIsNone(authenticate(email='nobody@example.com', password='password'))
+
+    def test_non_ascii_emails_log_in(self):
+        user = get_user_model().objects.create_user('jose', 'josé@example.com', 'password')
+        self.assertEqual(authenticate(email='josé@example.com', password='password'), user)
+        self.assertEqual(authenticate(email='JOSé@example.com', password='password'), user)
+
+    def test_emails_are_unique_regardless_of_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            get_user_model().objects.create_user('copy', 'patient@example.com', 'password')
+
+        # Users without an email stay possible
+        get_user_model().objects.create_user('first', "", 'password')
+        get_user_model().objects.create_user('second', "", 'password')
+
+    def test_hash_is_upgraded_to_the_configured_cost(self):
+        with self.settings(PASSWORD_HASHER_ITERATIONS=1000):
+            authenticate(email='patient@example.com', password='password')
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(self.user.check_password('password'))
+
+    def test_deactivated_users_are_told(self):
+        self.user.is_active = False
+        self.user.save()
+
+        form = UserLogInForm({'email': 'patient@example.com', 'password': 'password'})
+        self.assertFalse(form.is_valid())
+        self.assertIn("This email has been deactivated!", form.non_field_errors())
+
+    def test_login_and_token_obtain(self):
+        response = self.client.post(reverse('users:login'), {'email': 'patient@example.com', 'password': 'password'})
+        self.assertRedirects(response, reverse('healthcare:dashboard'), fetch_redirect_response=False)
+
+        response = self.client.post(reverse('users:token_obtain'),
+                                    {'email': 'PATIENT@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode_token(response.json()['token'])['user_id'], self.user.pk)
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+JWT_DEFAULTS = {
+    'JWT_SECRET_KEY': None,
+    'JWT_ALGORITHM': 'HS256',
+    'JWT_LEEWAY': 0,
+    'JWT_EXPIRATION_DELTA': timedelta(minutes=5),
+    'JWT_REFRESH_EXPIRATION_DELTA': timedelta(days=7),
+    'JWT_AUTH_HEADER_PREFIX': 'JWT',
+}
+
+
+class InvalidToken(Exception):
+    """
+        Raised for tokens that are malformed, expired or past their refresh window
+    """
+
+
+def jwt_setting(name):
+    value = getattr(settings, 'JWT_AUTH', {}).get(name, JWT_DEFAULTS[name])
+    if name == 'JWT_SECRET_KEY' and value is None:
+        return settings.SECRET_KEY
+    return value
+
+
+def _timestamp(value):
+    return int(value.timestamp())
+
+
+def issue_token(user, orig_iat=None):
+    """
+        A signed token carrying what the API needs to know about the user,
+        orig_iat is kept on refresh so the refresh window does not slide
+    """
+    now = timezone.now()
+    payload = {
+        'user_id': user.pk,
+        'username': user.get_username(),
+        'email': user.email,
+        'iat': _timestamp(now),
+        'exp': _timestamp(now + jwt_setting('JWT_EXPIRATION_DELTA')),
+        'orig_iat': orig_iat or _timestamp(now),
+    }
+    return jwt.encode(payload, jwt_setting('JWT_SECRET_KEY'), algorithm=jwt_setting('JWT_ALGORITHM'))
+
+
+def decode_token(token):
+    try:
+        return jwt.decode(token, jwt_setting('JWT_SECRET_KEY'), algorithms=[jwt_setting('JWT_ALGORITHM')],
+                          leeway=jwt_setting('JWT_LEEWAY'), options={'require': ['exp', 'user_id', 'orig_iat']})
+    except jwt.ExpiredSignatureError:
+        raise InvalidToken("Token has expired.")
+    except jwt.InvalidTokenError:
+        raise InvalidToken("Error decoding token.")
+
+
+def refresh_token(token):
+    """
+        A new token for a valid one, until JWT_REFRESH_EXPIRATION_DELTA after
+        the first login. The user is read again so deactivated users are cut off.
+    """
+    payload = decode_token(token)
+
+    refresh_limit = payload['orig_iat'] + int(jwt_setting('JWT_REFRESH_EXPIRATION_DELTA').total_seconds())
+    if _timestamp(timezone.now()) > refresh_limit:
+        raise InvalidToken("Refresh has expired.")
+
+    user = get_user_model().objects.filter(pk=payload['user_id'], is_active=True).first()
+    if user is None:
+        raise InvalidToken("User is inactive or does not exist.")
+    return issue_token(user, orig_iat=payload['orig_iat'])
+
+
+def user_from_payload(payload):
+    """
+        The user of a token without a database round trip, only the fields in
+        the claims are filled. Good for filters, foreign keys and related
+        lookups like user.profile. It is not staff, has no permissions and
+        refuses to be saved (see users.models), load the user for those.
+    """
+    user = get_user_model()(pk=payload['user_id'], email=payload.get('email', ""), is_active=True)
+    setattr(user, user.USERNAME_FIELD, payload.get('username', ""))
+    user._state.adding = False
+    user.from_token = True
+    # Permission checks answer False without querying the real permissions of the user
+    user._perm_cache = user._user_perm_cache = user._group_perm_cache = set()
+    return user
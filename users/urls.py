@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import LogInView
+from .views import LogInView, ObtainTokenApiView, RefreshTokenApiView
 
 app_name = 'users'
 
 urlpatterns = [
-    path('login/', LogInView.as_view(), name='login')
+    path('login/', LogInView.as_view(), name='login'),
+    path('api/token/', ObtainTokenApiView.as_view(), name='token_obtain'),
+    path('api/token/refresh/', RefreshTokenApiView.as_view(), name='token_refresh'),
 ]
\ No newline at end of file
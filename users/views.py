@@ -7,8 +7,12 @@ from django.http import HttpResponseRedirect
 # NOTE: TODO make AlreadyAuthorizedMixin and LoginRequiredMixin
 
 from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from .forms import UserLogInForm
+from .tokens import InvalidToken, issue_token, refresh_token
 
 
 class LogInView(TemplateView):
@@ -33,4 +37,34 @@ class LogInView(TemplateView):
         return render(self.request, self.template_name, context,
                       status=status.HTTP_400_BAD_REQUEST)
 
+
+class ObtainTokenApiView(APIView):
+    """
+        Trades an email and password for a token, for the mobile app and devices
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, *args, **kwargs):
+        form = UserLogInForm(self.request.data)
+        if not form.is_valid():
+            return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'token': issue_token(form.user)})
+
+
+class RefreshTokenApiView(APIView):
+    """
+        Trades a valid token for a new one, within the refresh window
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, *args, **kwargs):
+        try:
+            token = refresh_token(self.request.data.get('token', ""))
+        except InvalidToken as e:
+            return Response({'token': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'token': token})
+
+
 # NOTE: TODO change password view
\ No newline at end of file